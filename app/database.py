@@ -1,22 +1,190 @@
+import asyncio
 import os
+import time
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app.services import db_metrics
+
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "mysql+pymysql://appuser:apppassword@db:3306/call_recommend"
 )
 
-# enable pool_pre_ping to avoid stale/closed connections and improve reliability
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# 参照専用のレプリカ。未設定なら読み込みもプライマリ（DATABASE_URL）に向ける。
+# ローカルでは SQLite ファイル2つ（プライマリをコピーしたもの）や MySQL 2台で試せる
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+
+# チェックアウトごとに死活確認の往復が1回増える。無効にする場合は DB_POOL_RECYCLE
+# （MySQL の wait_timeout より短い秒数）で古い接続を使わないようにする
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+# 書き込み（POST など）の後この秒数は、同じクライアントの読み込みをプライマリに向ける。
+# レプリカの遅延で、登録した顧客や架電がすぐに見えない状態を避ける。0 で無効
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+# 同期ドライバ -> 非同期ドライバ。ASYNC_DATABASE_URL を指定すればそちらを優先する
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def _pool_options(prefix: str) -> dict:
+    """{prefix}POOL_SIZE / {prefix}MAX_OVERFLOW / {prefix}POOL_RECYCLE が設定されていればプールに使う。"""
+    options = {"pool_pre_ping": POOL_PRE_PING}
+    for name, key in (("POOL_SIZE", "pool_size"), ("MAX_OVERFLOW", "max_overflow"),
+                      ("POOL_RECYCLE", "pool_recycle")):
+        value = os.getenv(prefix + name)
+        if value:
+            options[key] = int(value)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_pool_options("DB_"))
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
 
+def async_database_url(url: str):
+    """同期ドライバの接続 URL を、同じ DB に非同期ドライバでつなぐ URL に読み替える。"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+# API の読み書きは非同期エンジンを使い、イベントループ上で DB を待つ。
+# 一括取込（pandas）と取込ジョブは同期エンジンのままスレッドプール／プロセスプールで動かす
+async_engine = create_async_engine(
+    os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL),
+    **_pool_options("DB_"),
+)
+# コミット後に属性を読むと暗黙の再読込（await できない I/O）が起きるため expire しない
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# 優先リストや顧客詳細の GET はレプリカのプールから読み、取込の書き込みと取り合わない
+if READ_DATABASE_URL:
+    read_async_engine = create_async_engine(
+        os.getenv("ASYNC_READ_DATABASE_URL") or async_database_url(READ_DATABASE_URL),
+        **_pool_options("READ_DB_"),
+    )
+    AsyncReadSessionLocal = async_sessionmaker(read_async_engine, expire_on_commit=False)
+else:
+    read_async_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    # ローカル検証用の SQLite でも、取込の書き込み中に API の読み込みが待たされないように WAL にする
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+for _engine in {engine, async_engine.sync_engine, read_async_engine.sync_engine}:
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _configure_sqlite)
+    db_metrics.instrument(_engine)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_write_db():
+    """書き込みを伴うエンドポイント用。プライマリにつなぐ。"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def reads_from_primary(request: Request) -> bool:
+    """直前に書き込んだクライアントの読み込みか（Cookie の期限内か）。"""
+    until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    try:
+        return until is not None and float(until) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request):
+    """参照だけのエンドポイント用。レプリカにつなぐ。
+    書き込み直後のクライアント（read-your-writes）はプライマリから読む。
+    """
+    session_factory = AsyncSessionLocal if reads_from_primary(request) else AsyncReadSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+def mark_read_your_writes(response) -> None:
+    """書き込みに成功したレスポンスに、しばらくプライマリから読むための Cookie を付ける。"""
+    if READ_DATABASE_URL and READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+            max_age=max(1, int(READ_YOUR_WRITES_SECONDS + 0.999)),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
+
+
+def wait_for_db(timeout: float, max_interval: float = 2.0) -> None:
+    """DB に接続できるまで待つ。間隔は 0.05 秒から倍々に伸ばし max_interval で頭打ちにする。"""
+    start = time.monotonic()
+    interval = 0.05
+    while True:
+        try:
+            with engine.connect():
+                return
+        except Exception as e:
+            if time.monotonic() - start + interval > timeout:
+                raise
+            print(f"Waiting for DB to be ready... ({interval:.2f}s)", str(e))
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+
+async def warm_up_pools(connections: int) -> None:
+    """各エンジンのプールに connections 本ずつ接続を張っておく（最初のリクエストで接続しない）。
+    同期エンジン（取込など同期エンドポイント用）はスレッドで張る。
+    """
+    def _limit(pool) -> int:
+        # プールの常駐数を超えて張ると、あふれた分は返却時に閉じられるだけなので上限をそろえる
+        return min(connections, getattr(pool, "size", lambda: connections)())
+
+    async def _open(target):
+        conns = await asyncio.gather(*(target.connect() for _ in range(_limit(target.sync_engine.pool))))
+        for conn in conns:
+            await conn.close()
+
+    def _open_sync():
+        conns = [engine.connect() for _ in range(_limit(engine.pool))]
+        for conn in conns:
+            conn.close()
+
+    engines = [async_engine] if read_async_engine is async_engine else [async_engine, read_async_engine]
+    await asyncio.gather(run_in_threadpool(_open_sync), *(_open(target) for target in engines))
+
+
+async def ping(target) -> None:
+    async with target.connect() as conn:
+        await conn.exec_driver_sql("SELECT 1")
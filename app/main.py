@@ -1,19 +1,81 @@
+import time
 from pathlib import Path
 
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from app.routers import customer, import_data, scoring
-from app.services import llm_service
+from app.database import mark_read_your_writes, wait_for_db
+from app.routers import customer, health, import_data, scoring
+from app.services import db_metrics, hint_prefetch, llm_service, metrics, profiling
 
 BASE_DIR = Path(__file__).parent.parent  # project root
 
-app = FastAPI(title="架電レコメンドツール")
+app = FastAPI(title="架電レコメンドツール", default_response_class=ORJSONResponse)
 
 app.mount("/static", StaticFiles(directory=BASE_DIR / "frontend" / "static"), name="static")
 templates = Jinja2Templates(directory=BASE_DIR / "frontend" / "templates")
 
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+@app.middleware("http")
+async def db_instrumentation(request: Request, call_next):
+    # SQL の数・DB 時間・プール待ちをヘッダーとログに出す（app/services/db_metrics.py）
+    if not db_metrics.ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    stats = db_metrics.start_request()
+    response = await call_next(request)
+    response.headers.update(stats.headers())
+    db_metrics.log_request(request.method, request.url.path, response.status_code,
+                           time.perf_counter() - start, stats)
+    return response
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    # 書き込みに成功したクライアントは、しばらく GET もプライマリから読む（app/database.py）
+    response = await call_next(request)
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        mark_read_your_writes(response)
+    return response
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    # ルートのテンプレートごとの件数・エラー・所要時間を /metrics 用に記録する
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.observe_request(request.method, metrics.route_template(request.scope), status,
+                                time.perf_counter() - start)
+
+
+if profiling.ENABLED:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        # X-Profile ヘッダー・?profile= を付けたリクエストだけを計測する（app/services/profiling.py）
+        profiler = profiling.begin(request)
+        if profiler is None:
+            return await call_next(request)
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+        response.headers["X-Profile-File"] = await run_in_threadpool(
+            profiler.save, request.method, request.url.path
+        )
+        return response
+
+
+app.include_router(health.router)
 app.include_router(customer.router, prefix="/api")
 app.include_router(scoring.router, prefix="/api")
 app.include_router(llm_service.router, prefix="/api")
@@ -39,29 +101,55 @@ def customer_detail_page(request: Request, customer_id: int):
 
 
 @app.on_event("startup")
-def startup_event():
-    from app.database import Base, engine
-    import time
+async def startup_event():
+    """STARTUP_MODE=full（既定）はスキーマ作成・マイグレーション・シード・スコア更新まで行う。
+    STARTUP_MODE=fast は本番のローリングデプロイ・オートスケール向けで、それらを省き
+    （スキーマは python -m app.migrations upgrade で事前に適用しておく）、
+    DB の待機とプールの事前接続だけをして受け付けを始める。
+    """
     import os
-    import app.models.customer  # noqa: F401
-    import app.models.call_record  # noqa: F401
-    import app.models.ocr_card  # noqa: F401
+    from app.database import warm_up_pools
+    from app.services.priority_service import start_rollover_scheduler
+
+    fast = os.getenv("STARTUP_MODE", "full") == "fast"
     # wait for DB to become available (useful when DB container still initializing)
-    max_wait = int(os.getenv("DB_WAIT_TIMEOUT", "60"))
-    start = time.time()
-    while True:
-        try:
-            with engine.connect() as conn:
-                break
-        except Exception as e:
-            if time.time() - start > max_wait:
-                raise
-            print("Waiting for DB to be ready...", str(e))
-            time.sleep(2)
+    await run_in_threadpool(wait_for_db, float(os.getenv("DB_WAIT_TIMEOUT", "60")))
+    if not fast:
+        await run_in_threadpool(_prepare_database)
+    await warm_up_pools(int(os.getenv("DB_POOL_WARMUP", "5")))
+    start_rollover_scheduler()
+    hint_prefetch.start()
+    health.mark_ready()
+
+    print("架電レコメンドツール起動完了" + ("（fast）" if fast else ""))
+
+
+def _prepare_database() -> None:
+    from app.database import SessionLocal, engine
+    from app.models import create_tables
+
+    create_tables(engine)
 
-    Base.metadata.create_all(bind=engine)
+    from app.migrations.runner import run_migrations
+    run_migrations(engine)
 
     from data_import.seed import seed
     seed()
 
-    print("架電レコメンドツール起動完了")
+    from app.services.priority_service import ensure_priority_current
+    db = SessionLocal()
+    try:
+        ensure_priority_current(db)
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.database import dispose_engines
+    from app.services import hint_engine
+    from app.services.import_jobs import shutdown_executor
+    shutdown_executor()
+    await hint_prefetch.stop()
+    await hint_engine.close()
+    await dispose_engines()
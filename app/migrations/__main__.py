@@ -0,0 +1,33 @@
+"""python -m app.migrations [upgrade|check]"""
+import sys
+
+from app.database import SessionLocal, engine
+from app.migrations.explain import check_index_usage
+from app.migrations.runner import run_migrations
+from app.models import create_tables
+
+
+def main(argv) -> int:
+    command = argv[1] if len(argv) > 1 else "upgrade"
+    if command == "upgrade":
+        create_tables(engine)
+        applied = run_migrations(engine)
+        print(f"適用済み: {applied}" if applied else "未適用のマイグレーションはありません。")
+        return 0
+    if command == "check":
+        db = SessionLocal()
+        try:
+            checks = check_index_usage(db)
+        finally:
+            db.close()
+        for check in checks:
+            print(f"[{'OK' if check.ok else 'NG'}] {check.name} -> {check.expected_index}")
+            for line in check.plan:
+                print(f"    {line}")
+        return 0 if all(check.ok for check in checks) else 1
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
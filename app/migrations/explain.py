@@ -0,0 +1,76 @@
+"""ホットパスのクエリがインデックスを使っているかを EXPLAIN で確認する。
+
+python -m app.migrations check で実行する。
+"""
+import re
+from typing import List, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.call_record import CallRecord
+from app.models.customer import Customer
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    expected_index: str
+    ok: bool
+    plan: List[str]
+
+
+def _hot_path_queries():
+    from app.services.call_history import batch_call_history_query, call_history_query
+    from app.services.priority_service import priority_list_query
+
+    return [
+        (
+            "scoring.get_priority_list",
+            "ix_customer_priority_score",
+            priority_list_query(limit=100),
+        ),
+        (
+            "customer.get_customer_detail (call history)",
+            "ix_call_record_customer_date",
+            call_history_query(1, limit=51),
+        ),
+        (
+            "customer.get_customers (windowed call history)",
+            "ix_call_record_customer_date",
+            batch_call_history_query([1, 2, 3], limit=51),
+        ),
+        (
+            "import lookup by company_key",
+            "uq_customer_company_key",
+            select(Customer.customer_id).where(Customer.company_key == "x"),
+        ),
+        (
+            "latest call date per customer",
+            "ix_call_record_customer_date",
+            select(func.max(CallRecord.call_date)).where(CallRecord.customer_id == 1),
+        ),
+    ]
+
+
+def _explain(db: Session, statement) -> List[str]:
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        return [row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    result = db.connection().exec_driver_sql(f"EXPLAIN {sql}")
+    keys = list(result.keys())
+    return [
+        f"table={row[keys.index('table')]} key={row[keys.index('key')]}"
+        for row in result
+    ]
+
+
+def check_index_usage(db: Session) -> List[PlanCheck]:
+    checks = []
+    for name, expected_index, statement in _hot_path_queries():
+        plan = _explain(db, statement)
+        # ix_customer_priority_score が ix_customer_priority_scored_on に部分一致しないよう名前全体で比べる
+        pattern = re.compile(rf"\b{re.escape(expected_index)}\b")
+        ok = any(pattern.search(line) for line in plan)
+        checks.append(PlanCheck(name, expected_index, ok, plan))
+    return checks
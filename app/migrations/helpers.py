@@ -0,0 +1,61 @@
+from sqlalchemy import inspect, text
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def create_index(conn, table: str, name: str, columns, unique: bool = False) -> None:
+    """インデックスが無ければ作成する（create_all 済みの新規DBでも安全に流せるように）。"""
+    if has_index(conn, table, name):
+        return
+    conn.exec_driver_sql(
+        "CREATE %sINDEX %s ON %s (%s)"
+        % ("UNIQUE " if unique else "", name, table, ", ".join(columns))
+    )
+
+
+def add_column(conn, table: str, column: str, ddl_type: str) -> None:
+    if has_column(conn, table, column):
+        return
+    conn.exec_driver_sql("ALTER TABLE %s ADD COLUMN %s %s" % (table, column, ddl_type))
+
+
+def assign_company_keys(conn, batch_size: int = 1000) -> int:
+    """company_key が NULL の顧客にキーを設定し、重複のため設定できなかった件数を返す。
+
+    既存データに正規化後の重複がある場合は最も古い顧客だけにキーを設定し、
+    残りは NULL のままにする（一意インデックスは NULL を重複とみなさない）。
+    """
+    from app.services.company_name import normalize_company_name
+
+    seen = set(
+        row[0] for row in conn.execute(
+            text("SELECT company_key FROM customer WHERE company_key IS NOT NULL")
+        )
+    )
+    rows = conn.execute(
+        text("SELECT customer_id, company_name FROM customer WHERE company_key IS NULL ORDER BY customer_id")
+    ).all()
+    updates = []
+    duplicates = 0
+    for customer_id, company_name in rows:
+        key = normalize_company_name(company_name)
+        if key is None or key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        updates.append({"customer_id": customer_id, "company_key": key})
+
+    for i in range(0, len(updates), batch_size):
+        conn.execute(
+            text("UPDATE customer SET company_key = :company_key WHERE customer_id = :customer_id"),
+            updates[i:i + batch_size],
+        )
+    if duplicates:
+        print(f"会社名が重複している顧客が{duplicates}件あります（company_key は未設定）。")
+    return duplicates
@@ -0,0 +1,57 @@
+"""バージョン管理付きのスキーママイグレーション。
+
+create_all は既存テーブルに列やインデックスを追加しないため、既存環境への変更は
+versions/ 以下に連番のモジュールとして追加し、MIGRATIONS に登録する。
+各モジュールの upgrade(conn) は create_all 済みの新規DBに流しても壊れないように書く。
+"""
+import importlib
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.exc import IntegrityError
+
+MIGRATIONS = [
+    (1, "v0001_hot_path_indexes"),
+    (2, "v0002_customer_company_key"),
+    (3, "v0003_customer_latest_call_date"),
+    (4, "v0004_company_key_legal_forms"),
+    (5, "v0005_customer_priority_double_score"),
+    (6, "v0006_import_job_duplicates"),
+]
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_versions(engine) -> set:
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine) -> list:
+    """未適用のマイグレーションを順に適用し、適用したバージョンを返す。"""
+    done = applied_versions(engine)
+    applied = []
+    for version, name in MIGRATIONS:
+        if version in done:
+            continue
+        module = importlib.import_module(f"app.migrations.versions.{name}")
+        try:
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.now(),
+                ))
+        except IntegrityError:
+            # 別ワーカーが同時に適用した（upgrade は冪等なのでそのまま進める）
+            continue
+        print(f"マイグレーション適用: {version:04d} {name}")
+        applied.append(version)
+    return applied
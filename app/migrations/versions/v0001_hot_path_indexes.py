@@ -0,0 +1,7 @@
+"""架電履歴の (customer_id, call_date) と会社名にインデックスを張る。"""
+from app.migrations.helpers import create_index
+
+
+def upgrade(conn):
+    create_index(conn, "call_record", "ix_call_record_customer_date", ["customer_id", "call_date"])
+    create_index(conn, "customer", "ix_customer_company_name", ["company_name"])
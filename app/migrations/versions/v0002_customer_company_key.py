@@ -0,0 +1,8 @@
+"""正規化した会社名 customer.company_key を追加し、一意インデックスを張る。"""
+from app.migrations.helpers import add_column, assign_company_keys, create_index
+
+
+def upgrade(conn):
+    add_column(conn, "customer", "company_key", "VARCHAR(255)")
+    assign_company_keys(conn)
+    create_index(conn, "customer", "uq_customer_company_key", ["company_key"], unique=True)
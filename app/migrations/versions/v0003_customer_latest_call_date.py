@@ -0,0 +1,14 @@
+"""customer.latest_call_date を追加し、call_record から埋める。"""
+from sqlalchemy import text
+
+from app.migrations.helpers import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "customer", "latest_call_date", "DATE")
+    conn.execute(text(
+        "UPDATE customer SET latest_call_date = ("
+        " SELECT MAX(call_record.call_date) FROM call_record"
+        " WHERE call_record.customer_id = customer.customer_id"
+        ")"
+    ))
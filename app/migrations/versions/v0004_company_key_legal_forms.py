@@ -0,0 +1,58 @@
+"""会社名の正規化に法人格の除去を加えたので company_key を振り直し、
+あいまい一致用の company_ngram を既存顧客について作る。
+
+後からモデルやサービスが変わっても結果が変わらないよう、テーブル定義と bigram の作り方は
+この時点のものをここに持つ。bigram は振り直した company_key から作る
+（キーが重複して NULL のままの顧客は、同じキーの古い顧客の側で一致する）。
+"""
+from sqlalchemy import column, insert, table, text
+
+from app.migrations.helpers import assign_company_keys, create_index
+
+BATCH_SIZE = 5000
+
+company_ngram = table("company_ngram", column("gram"), column("customer_id"))
+
+
+def _bigrams(key):
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+def upgrade(conn):
+    # 正規化後に別の顧客のキーと衝突しないよう、いったん全件クリアしてから振り直す
+    conn.execute(text("UPDATE customer SET company_key = NULL"))
+    assign_company_keys(conn)
+
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS company_ngram ("
+        " gram VARCHAR(8) NOT NULL,"
+        " customer_id INTEGER NOT NULL,"
+        " PRIMARY KEY (gram, customer_id),"
+        " FOREIGN KEY (customer_id) REFERENCES customer (customer_id))"
+    )
+    create_index(conn, "company_ngram", "ix_company_ngram_customer", ["customer_id"])
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT customer_id, company_key FROM customer"
+                " WHERE customer_id > :last_id AND company_key IS NOT NULL"
+                " ORDER BY customer_id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            insert(company_ngram)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite"),
+            [
+                {"gram": gram, "customer_id": customer_id}
+                for customer_id, company_key in rows
+                for gram in _bigrams(company_key)
+            ],
+        )
+        last_id = rows[-1][0]
@@ -0,0 +1,14 @@
+"""customer_priority.score を倍精度にする。
+
+MySQL では Float が単精度の FLOAT になり、スコアが丸められてキーセットページングの
+比較がずれていた。型を DOUBLE に変え、丸められた値は次回の確認で作り直されるよう
+scored_on を過去日にしておく。SQLite の REAL は元から倍精度なので何もしない。
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    if conn.dialect.name != "mysql":
+        return
+    conn.exec_driver_sql("ALTER TABLE customer_priority MODIFY score DOUBLE NOT NULL")
+    conn.execute(text("UPDATE customer_priority SET scored_on = :stale"), {"stale": "1970-01-01"})
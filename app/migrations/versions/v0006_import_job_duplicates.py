@@ -0,0 +1,6 @@
+"""import_job.duplicates を追加する（ファイル内で重複していた行数。skipped は登録済みの会社のみ）。"""
+from app.migrations.helpers import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "import_job", "duplicates", "INTEGER NOT NULL DEFAULT 0")
@@ -0,0 +1,32 @@
+"""テーブル定義。
+
+各モジュールを読み込むと Base.metadata にテーブルが登録される。
+テーブルを作る前には create_tables() で全モジュールをまとめて読み込む
+（customer は app.services.company_name を使うため、ここでは読み込み時に import しない）。
+"""
+import importlib
+
+MODEL_MODULES = (
+    "call_record",
+    "company_ngram",
+    "customer",
+    "customer_priority",
+    "generated_hint",
+    "import_job",
+    "ocr_card",
+    "task_lease",
+)
+
+
+def load_models() -> None:
+    """全テーブルのモジュールを読み込み、Base.metadata に登録する。"""
+    for name in MODEL_MODULES:
+        importlib.import_module(f"{__name__}.{name}")
+
+
+def create_tables(bind) -> None:
+    """未作成のテーブルを作る（既存のテーブルはそのまま）。"""
+    from app.database import Base
+
+    load_models()
+    Base.metadata.create_all(bind=bind)
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
 from app.database import Base
 
 
 class CallRecord(Base):
     __tablename__ = "call_record"
+    __table_args__ = (
+        Index("ix_call_record_customer_date", "customer_id", "call_date"),
+    )
 
     call_id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey("customer.customer_id"))
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.database import Base
+
+
+class CompanyNgram(Base):
+    """正規化した会社名の文字 bigram の転置インデックス（あいまい一致の候補絞り込み用）"""
+
+    __tablename__ = "company_ngram"
+    __table_args__ = (
+        Index("ix_company_ngram_customer", "customer_id"),
+    )
+
+    gram = Column(String(8), primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customer.customer_id"), primary_key=True)
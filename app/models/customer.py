@@ -1,16 +1,37 @@
-from sqlalchemy import Column, Integer, String, Date, Float
+from sqlalchemy import Column, Integer, String, Date, Float, Index
+from sqlalchemy import event
+from sqlalchemy.orm import validates
 from app.database import Base
+from app.services.company_name import index_company_ngrams, normalize_company_name
 
 
 class Customer(Base):
     __tablename__ = "customer"
+    __table_args__ = (
+        Index("uq_customer_company_key", "company_key", unique=True),
+    )
 
     customer_id = Column(Integer, primary_key=True)
     customer_name = Column(String(255), nullable=False)
     contact_number = Column(String(20))
     email = Column(String(255))
     address = Column(String(255))
-    company_name = Column(String(255), nullable=False)
+    company_name = Column(String(255), nullable=False, index=True)
+    # 重複判定用の正規化済み会社名（app/services/company_name.py）
+    company_key = Column(String(255))
     last_purchase_date = Column(Date)
     total_purchase = Column(Float, default=0.0)
     last_contact_method = Column(String(50))
+    # call_record から非正規化した最新架電日
+    latest_call_date = Column(Date)
+
+    @validates("company_name")
+    def _set_company_key(self, key, value):
+        self.company_key = normalize_company_name(value)
+        return value
+
+
+@event.listens_for(Customer, "after_insert")
+def _index_company_name(mapper, connection, target):
+    # ORM 経由で登録した顧客はあいまい一致用の bigram も同じトランザクションで登録する
+    index_company_ngrams(connection, [(target.customer_id, target.company_name)])
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Date, Float, ForeignKey, Index
+from app.database import Base
+
+
+class CustomerPriority(Base):
+    """架電優先スコアのマテリアライズ済みテーブル（顧客ごとに1行）"""
+
+    __tablename__ = "customer_priority"
+    __table_args__ = (
+        Index("ix_customer_priority_score", "score", "customer_id"),
+        Index("ix_customer_priority_scored_on", "scored_on"),
+    )
+
+    customer_id = Column(Integer, ForeignKey("customer.customer_id"), primary_key=True)
+    latest_call_date = Column(Date)
+    days_since_last_call = Column(Integer, nullable=False)
+    # MySQL の FLOAT（単精度）では丸められ、キーセットの (score, customer_id) 比較がずれるので倍精度にする
+    score = Column(Float(precision=53), nullable=False)
+    scored_on = Column(Date, nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from app.database import Base
+
+
+class GeneratedHint(Base):
+    """生成済みのトークスクリプトのヒント（キーは顧客の状態のハッシュ）。ワーカー間で共有する。"""
+
+    __tablename__ = "generated_hint"
+    __table_args__ = (
+        Index("ix_generated_hint_expires_at", "expires_at"),
+    )
+
+    state_key = Column(String(40), primary_key=True)
+    customer_id = Column(Integer, nullable=False)
+    hint = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
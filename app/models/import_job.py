@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from app.database import Base
+
+
+class ImportJob(Base):
+    __tablename__ = "import_job"
+
+    job_id = Column(String(36), primary_key=True)
+    kind = Column(String(20), nullable=False)
+    filename = Column(String(255))
+    status = Column(String(20), nullable=False, default="queued")
+    processed = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
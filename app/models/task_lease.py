@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, String
+from app.database import Base
+
+
+class TaskLease(Base):
+    """複数ワーカーのうち1つだけに実行させるバックグラウンド処理のリース。期限までは owner が持つ。"""
+
+    __tablename__ = "task_lease"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(64), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -1,55 +1,111 @@
-from typing import Dict
+import os
+from collections import defaultdict
+from datetime import date
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models.call_record import CallRecord
 from app.models.customer import Customer
+from app.schemas import CallHistoryItem, CustomerDetail
+from app.services.call_history import batch_call_history_query, call_history_query
 
 router = APIRouter()
 
+HISTORY_LIMIT = int(os.getenv("CALL_HISTORY_LIMIT", "50"))
+MAX_HISTORY_LIMIT = 500
+MAX_BATCH_CUSTOMERS = 200
 
-@router.get("/customer/{customer_id}", response_model=Dict)
-def get_customer_detail(customer_id: int, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.customer_id == customer_id).first()
+
+def encode_history_cursor(record: CallRecord) -> str:
+    return f"{record.call_date.isoformat()}_{record.call_id}"
+
+
+def decode_history_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        call_date, call_id = cursor.split("_")
+        return date.fromisoformat(call_date), int(call_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="history_cursor の形式が不正です")
+
+
+def _unknown_customer(customer_id: int) -> CustomerDetail:
+    return CustomerDetail(customer_id=customer_id, customer_name="不明な顧客")
+
+
+def _customer_detail(customer: Customer, records: List[CallRecord], history_limit: int) -> CustomerDetail:
+    """records は history_limit + 1 件まで読んだもの。超えた分があれば続きのカーソルを付ける。"""
+    detail = CustomerDetail.model_validate(customer)
+    detail.call_history = [CallHistoryItem.model_validate(record) for record in records[:history_limit]]
+    if len(records) > history_limit:
+        detail.next_history_cursor = encode_history_cursor(records[history_limit - 1])
+    return detail
+
+
+def _parse_ids(values: List[str]) -> List[int]:
+    ids = []
+    try:
+        for value in values:
+            ids.extend(int(item) for item in value.split(",") if item.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids には顧客IDをカンマ区切りで指定してください")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids を指定してください")
+    if len(ids) > MAX_BATCH_CUSTOMERS:
+        raise HTTPException(status_code=400, detail=f"ids は{MAX_BATCH_CUSTOMERS}件までです")
+    return ids
+
+
+@router.get("/customer/{customer_id}", response_model=CustomerDetail)
+async def get_customer_detail(
+    customer_id: int,
+    history_limit: int = Query(HISTORY_LIMIT, ge=1, le=MAX_HISTORY_LIMIT),
+    history_cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """顧客の詳細と架電履歴（新しい順に history_limit 件）を返す。
+    続きは next_history_cursor を history_cursor に渡して取得する。
+    """
+    before = decode_history_cursor(history_cursor) if history_cursor else None
+    customer = await db.get(Customer, customer_id)
     if not customer:
-        return {
-            "customer_id": customer_id,
-            "customer_name": "不明な顧客",
-            "contact_number": "",
-            "email": "",
-            "address": "",
-            "company_name": "",
-            "last_purchase_date": "",
-            "total_purchase": 0,
-            "last_contact_method": "",
-            "call_history": [],
-        }
-
-    call_records = (
-        db.query(CallRecord)
-        .filter(CallRecord.customer_id == customer_id)
-        .order_by(CallRecord.call_date.desc())
-        .all()
-    )
-
-    return {
-        "customer_id": customer.customer_id,
-        "customer_name": customer.customer_name,
-        "contact_number": customer.contact_number or "",
-        "email": customer.email or "",
-        "address": customer.address or "",
-        "company_name": customer.company_name,
-        "last_purchase_date": str(customer.last_purchase_date) if customer.last_purchase_date else "",
-        "total_purchase": customer.total_purchase or 0,
-        "last_contact_method": customer.last_contact_method or "",
-        "call_history": [
-            {
-                "call_date": str(r.call_date),
-                "call_result": r.call_result or "",
-                "call_duration": r.call_duration or "",
-            }
-            for r in call_records
-        ],
+        return _unknown_customer(customer_id)
+
+    records = (
+        await db.execute(call_history_query(customer_id, history_limit + 1, before))
+    ).scalars().all()
+    return _customer_detail(customer, records, history_limit)
+
+
+@router.get("/customers", response_model=List[CustomerDetail])
+async def get_customers(
+    ids: List[str] = Query(...),
+    history_limit: int = Query(HISTORY_LIMIT, ge=1, le=MAX_HISTORY_LIMIT),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """複数の顧客の詳細を ids の順に返す（ids=1,2,3 または ids=1&ids=2）。
+    顧客と架電履歴はそれぞれ1回のクエリでまとめて読み、履歴は顧客ごとに history_limit 件までにする。
+    履歴の続きは各顧客の next_history_cursor を /api/customer/{id} に渡して取得する。
+    """
+    customer_ids = _parse_ids(ids)
+    customers = {
+        customer.customer_id: customer
+        for customer in (
+            await db.execute(select(Customer).where(Customer.customer_id.in_(customer_ids)))
+        ).scalars()
     }
+    history = defaultdict(list)
+    if customers:
+        records = await db.execute(batch_call_history_query(list(customers), history_limit + 1))
+        for record in records.scalars():
+            history[record.customer_id].append(record)
+
+    return [
+        _customer_detail(customers[customer_id], history[customer_id], history_limit)
+        if customer_id in customers else _unknown_customer(customer_id)
+        for customer_id in customer_ids
+    ]
@@ -0,0 +1,56 @@
+"""ロードバランサー・オーケストレーター・監視向けのエンドポイント。
+
+/healthz はプロセスが応答できるかだけを返す（DB には触れない）。
+/readyz は起動処理が終わり、プライマリ（とレプリカ）に SELECT 1 が通るときだけ 200 を返す。
+/metrics は Prometheus 形式のメトリクス（app/services/metrics.py）を返す。
+"""
+import asyncio
+import os
+
+from fastapi import APIRouter, Response
+from fastapi.responses import ORJSONResponse
+
+from app.database import async_engine, engine, ping, read_async_engine
+from app.services import metrics
+
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "2"))
+
+router = APIRouter()
+
+_ready = False
+
+
+def mark_ready() -> None:
+    global _ready
+    _ready = True
+
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    if not _ready:
+        return ORJSONResponse({"status": "starting"}, status_code=503)
+    targets = {"primary": async_engine}
+    if read_async_engine is not async_engine:
+        targets["replica"] = read_async_engine
+    errors = {}
+    for name, target in targets.items():
+        try:
+            await asyncio.wait_for(ping(target), READINESS_TIMEOUT)
+        except Exception as e:
+            errors[name] = str(e) or type(e).__name__
+    if errors:
+        return ORJSONResponse({"status": "unavailable", "errors": errors}, status_code=503)
+    return {"status": "ok"}
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    if read_async_engine is not async_engine:
+        engines["replica"] = read_async_engine.sync_engine
+    return Response(metrics.render(engines), media_type="text/plain; version=0.0.4; charset=utf-8")
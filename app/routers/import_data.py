@@ -1,21 +1,64 @@
-import io
+import time
+import zipfile
 from datetime import date
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional
 
 import pandas as pd
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_write_db
 from app.models.call_record import CallRecord
 from app.models.customer import Customer
+from app.models.import_job import ImportJob
 from app.models.ocr_card import OcrCard
+from app.schemas import (
+    CallRecordsImportResult,
+    CardImportResult,
+    CardsImportResult,
+    ImportJobStatus,
+    ImportResult,
+    ManualImportResult,
+    SuccessResult,
+)
+from app.services import metrics, priority_cache
+from app.services.company_name import find_similar_customers, normalize_company_name
+from app.services.customer_import import (
+    CARD_FIELDS,
+    CHUNK_SIZE,
+    ImportFormatError,
+    import_card_chunk,
+    import_customer_chunk,
+    iter_csv_chunks,
+    iter_excel_chunks,
+)
+from app.services.import_jobs import job_kind_for, job_to_dict, submit_job
+from app.services.priority_service import refresh_priority
+from data_import.import_calls import import_call_records
+from data_import.parse_ocr import parse_ocr
 
 router = APIRouter()
 
+MAX_CARD_ERRORS = 20
+DUPLICATE_COMPANY_DETAIL = "同じ会社名の顧客が既に登録されています"
 
-@router.post("/import/manual", response_model=Dict)
-def import_manual(
+
+async def _flush_new_customer(db: AsyncSession) -> None:
+    """新規顧客を書き込む。確認後に他のリクエストが同じ会社名で登録していれば 400 を返す。"""
+    try:
+        await db.flush()
+    except IntegrityError:
+        # company_key の一意インデックスに当たった
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=DUPLICATE_COMPANY_DETAIL)
+
+
+@router.post("/import/manual", response_model=ManualImportResult)
+async def import_manual(
     customer_name: str = Form(...),
     company_name: str = Form(...),
     contact_number: str = Form(""),
@@ -23,7 +66,7 @@ def import_manual(
     address: str = Form(""),
     total_purchase: float = Form(0.0),
     last_purchase_date: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
 ):
     parsed_date: Optional[date] = None
     if last_purchase_date:
@@ -32,6 +75,14 @@ def import_manual(
         except ValueError:
             raise HTTPException(status_code=400, detail="最終購入日の形式が不正です（YYYY-MM-DD）")
 
+    exists = await db.scalar(
+        select(Customer.customer_id)
+        .where(Customer.company_key == normalize_company_name(company_name))
+        .limit(1)
+    )
+    if exists:
+        raise HTTPException(status_code=400, detail=DUPLICATE_COMPANY_DETAIL)
+
     customer = Customer(
         customer_name=customer_name,
         company_name=company_name,
@@ -43,20 +94,22 @@ def import_manual(
         last_contact_method="手動入力",
     )
     db.add(customer)
-    db.commit()
-    db.refresh(customer)
+    await _flush_new_customer(db)
+    await db.run_sync(refresh_priority, [customer.customer_id])
+    await db.commit()
+    priority_cache.invalidate()
     return {"success": True, "customer_id": customer.customer_id}
 
 
-@router.post("/call-record", response_model=Dict)
-def add_call_record(
+@router.post("/call-record", response_model=SuccessResult)
+async def add_call_record(
     customer_id: int = Form(...),
     call_date: str = Form(...),
     call_result: str = Form(...),
     call_duration: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
 ):
-    customer = db.query(Customer).filter(Customer.customer_id == customer_id).first()
+    customer = await db.get(Customer, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="顧客が見つかりません")
 
@@ -72,64 +125,122 @@ def add_call_record(
         call_duration=call_duration or None,
     )
     db.add(record)
-    db.commit()
+    if customer.latest_call_date is None or customer.latest_call_date < parsed_date:
+        customer.latest_call_date = parsed_date
+    await db.flush()
+    await db.run_sync(refresh_priority, [customer_id])
+    await db.commit()
+    priority_cache.invalidate()
     return {"success": True}
 
 
-@router.post("/import/csv", response_model=Dict)
-async def import_csv_file(
+def _import_chunks(db: Session, chunks, last_contact_method: str, kind: str) -> Dict:
+    start = time.perf_counter()
+    count = 0
+    skipped = 0
+    duplicates = 0
+    failed = 0
+    seen_keys = set()
+    try:
+        for chunk in chunks:
+            imported, chunk_skipped, chunk_duplicates, chunk_failed, chunk_keys = import_customer_chunk(
+                db, chunk, seen_keys, last_contact_method
+            )
+            db.commit()
+            seen_keys.update(chunk_keys)
+            count += imported
+            skipped += chunk_skipped
+            duplicates += chunk_duplicates
+            failed += chunk_failed
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        priority_cache.invalidate()
+
+    metrics.record_import(kind, count, time.perf_counter() - start)
+    return {
+        "success": True,
+        "imported": count,
+        "skipped": skipped,
+        "duplicates": duplicates,
+        "failed": failed,
+    }
+
+
+@router.post("/import/csv", response_model=ImportResult)
+def import_csv_file(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
 ):
+    """CSV を IMPORT_CHUNK_SIZE 行ずつ読み込んで登録する。コミットはチャンク単位。"""
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="CSVファイルをアップロードしてください")
 
-    content = await file.read()
     try:
-        df = pd.read_csv(io.BytesIO(content), encoding="utf-8")
-    except UnicodeDecodeError:
-        df = pd.read_csv(io.BytesIO(content), encoding="shift_jis")
+        return _import_chunks(db, iter_csv_chunks(file.file), "CSV取込", "csv")
+    except (UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise HTTPException(status_code=400, detail=f"CSVの読み込みに失敗しました: {e}")
 
-    required = {"customer_name", "company_name"}
-    if not required.issubset(df.columns):
-        raise HTTPException(status_code=400, detail=f"CSVに必須カラムがありません: {required}")
 
-    df.drop_duplicates(subset="company_name", inplace=True)
+@router.post("/import/excel", response_model=ImportResult)
+def import_excel_file(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    """Excel の全シートを IMPORT_CHUNK_SIZE 行ずつ読み込んで登録する。コミットはチャンク単位。"""
+    if not file.filename.lower().endswith((".xlsx", ".xlsm")):
+        raise HTTPException(status_code=400, detail="Excelファイル（.xlsx）をアップロードしてください")
 
-    count = 0
-    skipped = 0
-    for _, row in df.iterrows():
-        exists = db.query(Customer).filter(Customer.company_name == str(row["company_name"])).first()
-        if exists:
-            skipped += 1
-            continue
-        customer = Customer(
-            customer_name=str(row["customer_name"]),
-            company_name=str(row["company_name"]),
-            contact_number=str(row.get("contact_number", "") or "") or None,
-            email=str(row.get("email", "") or "") or None,
-            address=str(row.get("address", "") or "") or None,
-            total_purchase=float(row.get("total_purchase", 0) or 0),
-            last_contact_method="CSV取込",
-        )
-        db.add(customer)
-        count += 1
+    try:
+        return _import_chunks(db, iter_excel_chunks(file.file), "Excel取込", "excel")
+    except (InvalidFileException, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"Excelの読み込みに失敗しました: {e}")
+
+
+@router.post("/import/call-records", response_model=CallRecordsImportResult)
+def import_call_records_file(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    """電話システムの架電ログ CSV（customer_id, call_date, call_result, call_duration）を一括登録する。"""
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="CSVファイルをアップロードしてください")
+
+    start = time.perf_counter()
+    try:
+        result = import_call_records(db, file.file)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise HTTPException(status_code=400, detail=f"CSVの読み込みに失敗しました: {e}")
+    finally:
+        priority_cache.invalidate()
 
-    db.commit()
-    return {"success": True, "imported": count, "skipped": skipped}
+    metrics.record_import("call_records", result["imported"], time.perf_counter() - start)
+    return {"success": True, **result}
 
 
-@router.post("/import/card", response_model=Dict)
-def import_card(
+@router.post("/import/card", response_model=CardImportResult)
+async def import_card(
     company_name: str = Form(...),
     personal_name: str = Form(...),
     contact_number: str = Form(""),
     email: str = Form(""),
     address: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
 ):
-    customer = db.query(Customer).filter(Customer.company_name == company_name).first()
+    # 完全一致（正規化後）がなければ、OCR の読み違いなどの表記ゆれを n-gram で探す
+    match = "exact"
+    customer = await db.scalar(
+        select(Customer).where(Customer.company_key == normalize_company_name(company_name)).limit(1)
+    )
+    if not customer:
+        similar = await db.run_sync(find_similar_customers, company_name, limit=1)
+        if similar:
+            match = "fuzzy"
+            customer = await db.get(Customer, similar[0][0])
     if not customer:
+        match = "new"
         customer = Customer(
             customer_name=personal_name,
             company_name=company_name,
@@ -140,7 +251,8 @@ def import_card(
             last_contact_method="名刺",
         )
         db.add(customer)
-        db.flush()
+        await _flush_new_customer(db)
+        await db.run_sync(refresh_priority, [customer.customer_id])
 
     card = OcrCard(
         customer_id=customer.customer_id,
@@ -151,5 +263,98 @@ def import_card(
         address=address or None,
     )
     db.add(card)
-    db.commit()
-    return {"success": True, "customer_id": customer.customer_id}
+    await db.commit()
+    priority_cache.invalidate()
+    return {"success": True, "customer_id": customer.customer_id, "match": match}
+
+
+async def _iter_lines(stream) -> AsyncIterator[bytes]:
+    """リクエストボディを受信しながら1行ずつ返す。"""
+    buffer = b""
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def _parse_card_line(line: bytes):
+    try:
+        card = parse_ocr(line.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        return None, f"JSONとして読み込めません: {e}"
+    if not isinstance(card, dict):
+        return None, "1行に1件の名刺（JSONオブジェクト）を指定してください"
+    card = {field: str(card.get(field) or "").strip() for field in CARD_FIELDS}
+    if not card["company_name"] or not card["personal_name"]:
+        return None, "company_name と personal_name は必須です"
+    return card, None
+
+
+async def _import_card_batch(db: AsyncSession, cards, totals: Dict) -> None:
+    imported, new_customers, matched = await db.run_sync(import_card_chunk, cards)
+    await db.commit()
+    totals["imported"] += imported
+    totals["new_customers"] += new_customers
+    totals["matched_customers"] += matched
+
+
+@router.post("/import/cards", response_model=CardsImportResult)
+async def import_cards_batch(request: Request, db: AsyncSession = Depends(get_write_db)):
+    """名刺 OCR 結果を JSON Lines（1行1件）でまとめて登録する。
+
+    ボディは受信しながら parse_ocr で1行ずつ解析し、IMPORT_CHUNK_SIZE 件ごとに
+    会社の解決と顧客・名刺の一括登録を1トランザクションで行う。
+    解析できない行は failed として数え、先頭 MAX_CARD_ERRORS 件のエラーを返す。
+    """
+    start = time.perf_counter()
+    totals = {"imported": 0, "new_customers": 0, "matched_customers": 0, "failed": 0}
+    errors = []
+    batch = []
+    try:
+        line_no = 0
+        async for line in _iter_lines(request.stream()):
+            line_no += 1
+            if not line.strip():
+                continue
+            card, error = _parse_card_line(line)
+            if error:
+                totals["failed"] += 1
+                if len(errors) < MAX_CARD_ERRORS:
+                    errors.append({"line": line_no, "error": error})
+                continue
+            batch.append(card)
+            if len(batch) >= CHUNK_SIZE:
+                await _import_card_batch(db, batch, totals)
+                batch = []
+        if batch:
+            await _import_card_batch(db, batch, totals)
+    finally:
+        priority_cache.invalidate()
+
+    metrics.record_import("cards", totals["imported"], time.perf_counter() - start)
+    return {"success": True, **totals, "errors": errors}
+
+
+@router.post("/import/jobs", response_model=ImportJobStatus, status_code=202)
+def create_import_job(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    """ファイルを保存してバックグラウンド取込ジョブを登録し、job_id をすぐに返す。"""
+    kind = job_kind_for(file.filename)
+    if kind is None:
+        raise HTTPException(status_code=400, detail="CSVまたはExcelファイルをアップロードしてください")
+
+    job = submit_job(db, file.file, file.filename, kind)
+    return job_to_dict(job)
+
+
+@router.get("/import/jobs/{job_id}", response_model=ImportJobStatus)
+async def get_import_job(job_id: str, db: AsyncSession = Depends(get_write_db)):
+    job = await db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="取込ジョブが見つかりません")
+    return job_to_dict(job)
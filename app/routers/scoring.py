@@ -1,56 +1,83 @@
-from datetime import date
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models.call_record import CallRecord
-from app.models.customer import Customer
+from app.database import (
+    READ_DATABASE_URL,
+    READ_YOUR_WRITES_SECONDS,
+    SessionLocal,
+    get_read_db,
+    reads_from_primary,
+)
+from app.schemas import PriorityListItem
+from app.services import priority_cache
+from app.services.priority_service import (
+    ensure_priority_current,
+    priority_checked_today,
+    priority_list_query,
+)
 
 router = APIRouter()
 
 
-@router.get("/priority-list", response_model=List[Dict])
-def get_priority_list(db: Session = Depends(get_db)):
+@router.get("/priority-list", response_model=List[PriorityListItem])
+async def get_priority_list(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after_score: Optional[float] = None,
+    after_id: Optional[int] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    db: AsyncSession = Depends(get_read_db),
+):
     """架電優先リストをスコア順で返す。
-    スコア式: (total_purchase / 1000) + (1 / days_since_last_call) * 100
+    スコア式と係数は app/services/scoring_engine.py を参照。
+    スコアは customer_priority に計算済みのものを読むだけにする。
+    続きを取得するときは直前のページ末尾の score / customer_id を
+    after_score / after_id に渡す（キーセットページング）。
+    q を指定すると顧客名に q を含む顧客だけに絞り込む（並び順とページングは同じ）。
+    結果はキャッシュし、If-None-Match が一致すれば DB に触れず 304 を返す。
+    書き込み直後でプライマリから読むクライアントにはキャッシュを使わない。
     """
-    latest_call_subq = (
-        db.query(
-            CallRecord.customer_id,
-            func.max(CallRecord.call_date).label("latest_call_date"),
-        )
-        .group_by(CallRecord.customer_id)
-        .subquery()
-    )
-
-    rows = (
-        db.query(Customer, latest_call_subq.c.latest_call_date)
-        .outerjoin(latest_call_subq, Customer.customer_id == latest_call_subq.c.customer_id)
-        .all()
-    )
-
-    today = date.today()
-    customers = []
-    for customer, latest_call_date in rows:
-        if latest_call_date:
-            days_since_last_call = max((today - latest_call_date).days, 1)
+    if (after_score is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_score と after_id は同時に指定してください")
+
+    q = (q or "").strip() or None
+    cache_key = (limit, after_score, after_id, q)
+    if_none_match = request.headers.get("if-none-match")
+    from_primary = reads_from_primary(request)
+    # キャッシュはレプリカの遅れで書き込み前の内容のことがあるので、自分の書き込みを読む場合は使わない
+    entry = None if from_primary else priority_cache.get(cache_key)
+    if entry is None:
+        version = priority_cache.current_version()
+        rows = await _load_priority_list(db, limit, after_score, after_id, q)
+        replica_lag = READ_YOUR_WRITES_SECONDS if READ_DATABASE_URL and not from_primary else 0.0
+        if limit is None:
+            # 全件のシリアライズと ETag 計算は重いのでイベントループを止めないようにスレッドで行う
+            entry = await run_in_threadpool(priority_cache.put, cache_key, rows, version, replica_lag)
         else:
-            days_since_last_call = 365
-
-        score = round(
-            (customer.total_purchase / 1000) + (1 / days_since_last_call) * 100,
-            2,
-        )
-        customers.append({
-            "customer_id": customer.customer_id,
-            "customer_name": customer.customer_name,
-            "company_name": customer.company_name,
-            "total_purchase": customer.total_purchase,
-            "days_since_last_call": days_since_last_call,
-            "score": score,
-        })
-
-    return sorted(customers, key=lambda x: x["score"], reverse=True)
+            entry = priority_cache.put(cache_key, rows, version, replica_lag)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if if_none_match == entry.etag:
+        return Response(status_code=304, headers=headers)
+    # シリアライズ済みの本文を返す（response_model による検証・変換は通らない）
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _ensure_priority_current() -> None:
+    # ロールオーバー処理はロックを取る同期処理なので、イベントループではなくスレッドで行う
+    db = SessionLocal()
+    try:
+        ensure_priority_current(db)
+    finally:
+        db.close()
+
+
+async def _load_priority_list(db: AsyncSession, limit, after_score, after_id, q=None) -> List[Dict]:
+    if not priority_checked_today():
+        await run_in_threadpool(_ensure_priority_current)
+    rows = (await db.execute(priority_list_query(limit, after_score, after_id, q))).all()
+    # 列名は PriorityListItem のフィールド名と同じ
+    return [row._asdict() for row in rows]
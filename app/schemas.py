@@ -0,0 +1,109 @@
+"""API のレスポンスモデル。
+
+JSON の形は従来どおり（未入力の文字列・日付は ""、日付は YYYY-MM-DD）で、
+ORM の値からの変換は BeforeValidator で行う。
+"""
+from datetime import date, datetime
+from typing import Annotated, List, Literal, Optional
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+
+# None を "" にする文字列
+Text = Annotated[str, BeforeValidator(lambda value: "" if value is None else value)]
+# date を YYYY-MM-DD に、None を "" にする
+DateText = Annotated[
+    str,
+    BeforeValidator(lambda value: value.isoformat() if isinstance(value, date) else (value or "")),
+]
+
+
+class PriorityListItem(BaseModel):
+    customer_id: int
+    customer_name: str
+    company_name: str
+    total_purchase: float
+    days_since_last_call: int
+    score: float
+
+
+class CallHistoryItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    call_date: DateText
+    call_result: Text = ""
+    call_duration: Text = ""
+
+
+class CustomerDetail(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    customer_id: int
+    customer_name: str
+    contact_number: Text = ""
+    email: Text = ""
+    address: Text = ""
+    company_name: Text = ""
+    last_purchase_date: DateText = ""
+    total_purchase: Annotated[float, BeforeValidator(lambda value: value or 0.0)] = 0.0
+    last_contact_method: Text = ""
+    call_history: List[CallHistoryItem] = []
+    # 続きの架電履歴があるときだけ入る（history_cursor に渡す）
+    next_history_cursor: Optional[str] = None
+
+
+class SuccessResult(BaseModel):
+    success: bool = True
+
+
+class ManualImportResult(SuccessResult):
+    customer_id: int
+
+
+class ImportResult(SuccessResult):
+    imported: int
+    skipped: int
+    duplicates: int
+    failed: int
+
+
+class CallRecordsImportResult(SuccessResult):
+    imported: int
+    invalid: int
+    unknown_customer: int
+
+
+class CardImportResult(SuccessResult):
+    customer_id: int
+    match: Literal["exact", "fuzzy", "new"]
+
+
+class CardLineError(BaseModel):
+    line: int
+    error: str
+
+
+class CardsImportResult(SuccessResult):
+    imported: int
+    new_customers: int
+    matched_customers: int
+    failed: int
+    errors: List[CardLineError]
+
+
+class ImportJobStatus(BaseModel):
+    job_id: str
+    kind: str
+    filename: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    processed: int
+    imported: int
+    skipped: int
+    duplicates: int
+    failed: int
+    error: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class ScriptHint(BaseModel):
+    hint: str
@@ -0,0 +1,28 @@
+"""大量行の高速 INSERT。
+
+SQLAlchemy の executemany は行ごとに型変換とパラメータ組み立てを行うため、数十万行規模では
+それ自体がボトルネックになる。ここでは DBAPI の executemany にタプルをそのまま渡す。
+日付は ISO 形式の文字列で渡すこと（SQLite / MySQL のどちらでも DATE 列として解釈される）。
+"""
+from typing import Iterable, Sequence
+
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+
+def executemany_insert(db, table: Table, columns: Sequence[str], rows: Iterable[tuple]) -> None:
+    """table に rows（columns の順に並んだタプル）を挿入する。コミットは呼び出し側で行う。"""
+    conn = db.connection() if isinstance(db, Session) else db
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        table.name,
+        ", ".join(columns),
+        ", ".join([placeholder] * len(columns)),
+    )
+    rows = list(rows)
+    if rows:
+        conn.exec_driver_sql(sql, rows)
+
+
+def iso_date(value):
+    return value.isoformat() if value is not None else None
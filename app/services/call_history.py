@@ -0,0 +1,53 @@
+"""架電履歴を読むクエリ。
+
+顧客詳細のエンドポイント（app/routers/customer.py）とヒント生成（hint_engine）、
+インデックスの確認（app/migrations/explain.py）で同じ並び順・同じ SQL を使う。
+"""
+from datetime import date
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import aliased
+
+from app.models.call_record import CallRecord
+
+# 架電履歴の並び順（新しい順）。同じ日付の中は call_id で順序を固定してページングする
+HISTORY_ORDER = (CallRecord.call_date.desc(), CallRecord.call_id.desc())
+
+
+def call_history_query(customer_id: int, limit: Optional[int] = None,
+                       before: Optional[Tuple[date, int]] = None):
+    query = (
+        select(CallRecord)
+        .where(CallRecord.customer_id == customer_id)
+        .order_by(*HISTORY_ORDER)
+    )
+    if before is not None:
+        before_date, before_id = before
+        query = query.where(
+            or_(
+                CallRecord.call_date < before_date,
+                and_(CallRecord.call_date == before_date, CallRecord.call_id < before_id),
+            )
+        )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def batch_call_history_query(customer_ids: Sequence[int], limit: int):
+    """複数顧客の架電履歴を、顧客ごとに新しい順で limit 件ずつ1回のクエリで読む。"""
+    row_number = func.row_number().over(
+        partition_by=CallRecord.customer_id, order_by=HISTORY_ORDER
+    ).label("row_number")
+    ranked = (
+        select(CallRecord, row_number)
+        .where(CallRecord.customer_id.in_(customer_ids))
+        .subquery()
+    )
+    history = aliased(CallRecord, ranked)
+    return (
+        select(history)
+        .where(ranked.c.row_number <= limit)
+        .order_by(ranked.c.customer_id, ranked.c.row_number)
+    )
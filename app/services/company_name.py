@@ -0,0 +1,200 @@
+"""会社名の正規化とあいまい一致。
+
+customer.company_key には normalize_company_name の結果を保存して完全一致の重複判定に使う。
+表記ゆれ（誤字・OCR の読み違いなど）の候補は company_ngram（文字 bigram の転置インデックス）
+から prefix filtering で絞り込み、Dice 係数で判定する。
+"""
+import math
+import os
+import re
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.orm import aliased
+
+from app.models.company_ngram import CompanyNgram
+
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.8"))
+MAX_CANDIDATES = 500
+# これより多くの会社名に出てくる bigram（「工業」「商事」など）は転置リストが長く、
+# 読むと1件の検索に数ミリ秒かかるため候補の絞り込みには使わない（読むときもこの件数まで）
+MAX_GRAM_FREQUENCY = int(os.getenv("FUZZY_MAX_GRAM_FREQUENCY", "1000"))
+MAX_CACHED_FREQUENCIES = 100_000
+FREQUENCY_CACHE_TTL = 60
+
+# bigram ごとの出現件数。prefix filtering はどの順序で選んでも取りこぼさないため、
+# 件数は多少古くてもよく、プロセス内にキャッシュして毎回の集計を省く。
+# ただし 0件の bigram は候補なしと判断するのに使うので、このプロセスで登録した bigram は
+# その場で消し、他のプロセスの登録は FREQUENCY_CACHE_TTL 秒ごとに全体を捨てて拾う。
+_gram_frequencies = {}
+_gram_frequencies_since = 0.0
+
+_WHITESPACE = re.compile(r"\s+")
+_LEGAL_FORMS = (
+    "特定非営利活動法人", "一般社団法人", "一般財団法人", "公益社団法人", "公益財団法人",
+    "社会福祉法人", "医療法人社団", "医療法人", "学校法人", "npo法人",
+    "株式会社", "有限会社", "合同会社", "合資会社", "合名会社",
+    "(株)", "(有)", "(同)", "(資)", "(名)", "(社)", "(財)",
+)
+_LEGAL_FORM_PATTERN = "|".join(re.escape(form) for form in _LEGAL_FORMS)
+_LEGAL_PREFIX = re.compile(rf"^(?:{_LEGAL_FORM_PATTERN})+")
+_LEGAL_SUFFIX = re.compile(rf"(?:{_LEGAL_FORM_PATTERN})+$")
+# 英語表記は空白を消す前に語境界で落とす（"zinc" の "inc" などを誤って削らないように）
+_ENGLISH_SUFFIX = re.compile(
+    r"[\s,.]*\b(?:co\.?,?\s*ltd|inc|corp|corporation|ltd|k\.?\s?k|llc)\.?$"
+)
+
+
+def normalize_company_name(name: Optional[str]) -> Optional[str]:
+    """会社名を重複判定用のキーに正規化する。
+    全角・半角の統一（NFKC）、大文字・小文字の統一、法人格（株式会社・(株)・Inc. など）の除去、
+    空白の除去を行う。例: 「株式会社東京商事」「東京商事(株)」「東京商事　株式会社」→「東京商事」
+    """
+    if name is None:
+        return None
+    key = unicodedata.normalize("NFKC", str(name)).casefold().strip()
+    key = _ENGLISH_SUFFIX.sub("", key)
+    key = _WHITESPACE.sub("", key)
+    stripped = _LEGAL_SUFFIX.sub("", _LEGAL_PREFIX.sub("", key))
+    # 法人格だけの名前は削らずに残す
+    key = stripped or key
+    return key or None
+
+
+def company_ngrams(key: Optional[str]) -> Set[str]:
+    """正規化済みの会社名を文字 bigram の集合にする（1文字の名前はその文字だけ）。"""
+    if not key:
+        return set()
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+def index_company_ngrams(conn, customers: Iterable[Tuple[int, str]]) -> None:
+    """(customer_id, company_name) の bigram を company_ngram に登録する。
+    conn は Session / Connection のどちらでもよい。コミットは呼び出し側で行う。
+    """
+    rows = [
+        {"gram": gram, "customer_id": customer_id}
+        for customer_id, company_name in customers
+        for gram in company_ngrams(normalize_company_name(company_name))
+    ]
+    for row in rows:
+        _gram_frequencies.pop(row["gram"], None)
+    if rows:
+        conn.execute(
+            insert(CompanyNgram.__table__)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite"),
+            rows,
+        )
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _frequencies(db, grams: Set[str]) -> dict:
+    global _gram_frequencies_since
+    now = time.monotonic()
+    if now - _gram_frequencies_since > FREQUENCY_CACHE_TTL:
+        _gram_frequencies.clear()
+        _gram_frequencies_since = now
+    missing = [gram for gram in grams if gram not in _gram_frequencies]
+    if missing:
+        if len(_gram_frequencies) + len(missing) > MAX_CACHED_FREQUENCIES:
+            _gram_frequencies.clear()
+        counts = dict(
+            db.execute(
+                select(CompanyNgram.gram, func.count())
+                .where(CompanyNgram.gram.in_(missing))
+                .group_by(CompanyNgram.gram)
+            ).all()
+        )
+        for gram in missing:
+            _gram_frequencies[gram] = counts.get(gram, 0)
+    return {gram: _gram_frequencies[gram] for gram in grams}
+
+
+@lru_cache(maxsize=None)
+def _candidate_queries():
+    """候補を引く SQL。毎回組み立てると1件あたり数百マイクロ秒かかるため一度だけ作る。
+    （customer のモデルが company_name を import するので、モジュールの読み込み時には作れない）
+    """
+    from app.models.customer import Customer
+
+    def with_keys(candidate_ids):
+        # company_key は normalize_company_name 済みなので正規化し直さずに使える
+        return (
+            select(Customer.customer_id, Customer.company_key)
+            .where(Customer.customer_id.in_(candidate_ids.scalar_subquery()))
+        )
+
+    by_prefix = (
+        select(CompanyNgram.customer_id)
+        .where(CompanyNgram.gram.in_(bindparam("grams", expanding=True)))
+        .group_by(CompanyNgram.customer_id)
+        .order_by(func.count().desc())
+        .limit(MAX_CANDIDATES)
+    )
+    first = (
+        select(CompanyNgram.customer_id)
+        .where(CompanyNgram.gram == bindparam("first"))
+        .limit(MAX_GRAM_FREQUENCY)
+        .subquery()
+    )
+    second = aliased(CompanyNgram)
+    by_pair = (
+        select(first.c.customer_id)
+        .join(second, (second.customer_id == first.c.customer_id) & (second.gram == bindparam("second")))
+        .limit(MAX_CANDIDATES)
+    )
+    return with_keys(by_prefix), with_keys(by_pair)
+
+
+def find_similar_customers(db, company_name: str, threshold: float = FUZZY_MATCH_THRESHOLD,
+                           limit: int = 5) -> List[Tuple[int, float]]:
+    """表記ゆれを含めて似ている顧客を (customer_id, 類似度) の降順で返す。
+
+    Dice 係数が threshold 以上になるには bigram が k 個以上一致する必要があるため、
+    出現件数の少ない bigram から n - k + 1 個を選べば、候補は必ずそのどれかを含む
+    （prefix filtering）。候補は選んだ bigram の一致数が多い順に MAX_CANDIDATES 件までに絞る。
+
+    出現件数が MAX_GRAM_FREQUENCY を超える bigram の転置リストは読まない。そのため
+    選んだ bigram のうちよく出るものしか共有しない顧客は見落とす。選んだ bigram に
+    （どの顧客にもないものを除いて）よく出るものしかなければ、登録のある bigram のうち
+    最も少ないものの転置リストを MAX_GRAM_FREQUENCY 件まで読み、2番目に少ないものも含む
+    顧客を候補にする（読まなかった分は見落とす）。
+    """
+    grams = company_ngrams(normalize_company_name(company_name))
+    if not grams:
+        return []
+    required = max(1, math.ceil(threshold * len(grams) / (2 - threshold)))
+
+    frequencies = _frequencies(db, grams)
+    ordered = sorted(grams, key=lambda gram: frequencies.get(gram, 0))
+    prefix = [gram for gram in ordered[:len(grams) - required + 1] if frequencies.get(gram, 0) > 0]
+    if not prefix:
+        # 選んだ bigram がどの顧客にもなければ、threshold に届く顧客はいない
+        return []
+    indexed = [gram for gram in ordered if frequencies.get(gram, 0) > 0]
+    selective = [gram for gram in indexed if frequencies[gram] <= MAX_GRAM_FREQUENCY]
+
+    by_prefix, by_pair = _candidate_queries()
+    if selective:
+        candidates = db.execute(by_prefix, {"grams": selective}).all()
+    else:
+        # bigram が1つしかなければ同じ bigram どうしで結合する（その bigram を含む顧客になる）
+        second = indexed[1] if len(indexed) > 1 else indexed[0]
+        candidates = db.execute(by_pair, {"first": indexed[0], "second": second}).all()
+    scored = [
+        (customer_id, round(_dice(grams, company_ngrams(key)), 3))
+        for customer_id, key in candidates
+    ]
+    matches = [item for item in scored if item[1] >= threshold]
+    return sorted(matches, key=lambda item: (-item[1], item[0]))[:limit]
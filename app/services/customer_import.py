@@ -0,0 +1,274 @@
+"""顧客データ取込の共通処理。
+
+アップロードされたファイルは全体をメモリに載せず chunk_size 行ずつ読み込み、
+チャンクごとにコミットする。CSV は読み込み前にファイル全体を流し読みして文字コードを判定し、
+Excel は openpyxl の read-only モードで全シートを順に読む。
+"""
+import codecs
+import io
+import os
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.customer import Customer
+from app.models.ocr_card import OcrCard
+from app.services.company_name import index_company_ngrams, normalize_company_name
+from app.services.priority_service import refresh_priority
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+ENCODING_BLOCK_SIZE = 1024 * 1024
+LOOKUP_BATCH_SIZE = 1000
+REQUIRED_COLUMNS = {"customer_name", "company_name"}
+
+
+class ImportFormatError(ValueError):
+    """取込ファイルの形式が不正"""
+
+
+def _decodes_as(fileobj: BinaryIO, encoding: str, block_size: int) -> bool:
+    start = fileobj.tell()
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        while True:
+            block = fileobj.read(block_size)
+            decoder.decode(block, final=not block)
+            if not block:
+                return True
+    except UnicodeDecodeError:
+        return False
+    finally:
+        fileobj.seek(start)
+
+
+def detect_encoding(fileobj: BinaryIO, block_size: int = ENCODING_BLOCK_SIZE) -> str:
+    """ファイル全体が UTF-8 として読めるか、だめなら Shift_JIS(CP932) として読めるかを判定し、
+    読み出し位置を戻す。先頭だけで判定すると、途中で読めない文字が出たときに
+    それまでのチャンクがコミット済みになるため、取込前に全体を確認する。
+    """
+    if _decodes_as(fileobj, "utf-8", block_size):
+        return "utf-8-sig"
+    if _decodes_as(fileobj, "cp932", block_size):
+        return "cp932"
+    raise ImportFormatError("CSVの文字コードを判定できません（UTF-8 または Shift_JIS で保存してください）")
+
+
+def iter_csv_chunks(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE,
+                    required_columns: Set[str] = REQUIRED_COLUMNS) -> Iterator[pd.DataFrame]:
+    """CSV を chunk_size 行ずつの DataFrame として返す。"""
+    encoding = detect_encoding(fileobj)
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline="")
+    try:
+        try:
+            reader = pd.read_csv(text, chunksize=chunk_size)
+        except pd.errors.EmptyDataError:
+            raise ImportFormatError("CSVが空です")
+        for i, chunk in enumerate(reader):
+            if i == 0 and not required_columns.issubset(chunk.columns):
+                raise ImportFormatError(f"CSVに必須カラムがありません: {required_columns}")
+            yield chunk
+    finally:
+        # UploadFile 側のファイルを閉じないように切り離す
+        text.detach()
+
+
+def _sheet_chunks(rows, chunk_size: int) -> Iterator[pd.DataFrame]:
+    header = None
+    buffer = []
+    for row in rows:
+        if all(value is None or str(value).strip() == "" for value in row):
+            continue
+        if header is None:
+            header = [str(value).strip() if value is not None else "" for value in row]
+            if not REQUIRED_COLUMNS.issubset(header):
+                # 集計用シートなど必須カラムのないシートは読み飛ばす
+                return
+            continue
+        buffer.append(row[:len(header)])
+        if len(buffer) >= chunk_size:
+            yield pd.DataFrame(buffer, columns=header)
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=header)
+
+
+def iter_excel_chunks(fileobj, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Excel の全シートを openpyxl の read-only モードで1行ずつ読み、chunk_size 行ずつ返す。
+
+    各シートの先頭行をヘッダーとして扱い、必須カラムのないシートは読み飛ばす。
+    メモリ使用量はブックの大きさではなくチャンクの大きさに比例する。
+    """
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    found = False
+    try:
+        for sheet in workbook.worksheets:
+            for chunk in _sheet_chunks(sheet.iter_rows(values_only=True), chunk_size):
+                found = True
+                yield chunk
+    finally:
+        workbook.close()
+    if not found:
+        raise ImportFormatError(f"Excelに必須カラムを含むシートがありません: {REQUIRED_COLUMNS}")
+
+
+def find_customer_ids(db: Session, company_keys: Iterable[str]) -> Dict[str, int]:
+    """company_key -> customer_id を IN クエリでまとめて引く。"""
+    keys = [key for key in set(company_keys) if key]
+    found = {}
+    for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        rows = db.execute(
+            select(Customer.company_key, Customer.customer_id)
+            .where(Customer.company_key.in_(keys[i:i + LOOKUP_BATCH_SIZE]))
+        )
+        found.update((key, customer_id) for key, customer_id in rows)
+    return found
+
+
+def bulk_insert_customers(db: Session, rows: List[dict]) -> Dict[str, int]:
+    """顧客を executemany でまとめて登録し、company_key -> customer_id を返す。
+
+    rows には company_key を含めること（ORM の validates を通らないため）。
+    同時に別の取込が同じ会社を登録していた場合は INSERT IGNORE 相当で読み飛ばす。
+    あいまい一致用の bigram と優先度スコアも登録した顧客の分だけ更新する。
+    コミットは呼び出し側で行う。
+    """
+    if not rows:
+        return {}
+    stmt = (
+        insert(Customer.__table__)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    db.execute(stmt, rows)
+    ids = find_customer_ids(db, [row["company_key"] for row in rows])
+    index_company_ngrams(db, [
+        (ids[row["company_key"]], row["company_name"]) for row in rows if row["company_key"] in ids
+    ])
+    refresh_priority(db, ids.values())
+    return ids
+
+
+def _text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    values = df[column].astype(object).where(df[column].notna(), None)
+    values = values.map(lambda v: str(v) if v is not None else None)
+    return values.where(values != "", None)
+
+
+def _date_column(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    parsed = pd.to_datetime(df[column], errors="coerce")
+    return pd.Series(
+        [value.date() if not pd.isna(value) else None for value in parsed],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def customer_rows(df: pd.DataFrame, last_contact_method: str) -> List[dict]:
+    """DataFrame を customer テーブルへの INSERT 用の辞書リストに変換する。
+    last_contact_method 列がない行には引数の値（取込経路）を入れる。
+    """
+    if "total_purchase" in df.columns:
+        total_purchase = pd.to_numeric(df["total_purchase"], errors="coerce").fillna(0.0)
+    else:
+        total_purchase = pd.Series(0.0, index=df.index)
+    contact_method = _text_column(df, "last_contact_method").map(lambda v: v or last_contact_method)
+    columns = {
+        "customer_name": _text_column(df, "customer_name"),
+        "company_name": _text_column(df, "company_name"),
+        "company_key": df["company_key"],
+        "contact_number": _text_column(df, "contact_number"),
+        "email": _text_column(df, "email"),
+        "address": _text_column(df, "address"),
+        "total_purchase": total_purchase.astype(float),
+        "last_purchase_date": _date_column(df, "last_purchase_date"),
+        "last_contact_method": contact_method,
+    }
+    return pd.DataFrame(columns, index=df.index).to_dict("records")
+
+
+def import_customer_chunk(db: Session, df: pd.DataFrame, seen_keys: Set[str],
+                          last_contact_method: str = "CSV取込") -> Tuple[int, int, int, int, Set[str]]:
+    """1チャンク分の顧客を登録して (imported, skipped, duplicates, failed, company_keys) を返す。
+
+    必須項目（顧客名・会社名）が空の行は取り込まずに failed として数える。
+    既に登録済みの会社は skipped、ファイル内の重複（チャンク内の2件目以降と seen_keys に
+    記録済みのもの）は duplicates として数える。登録済みかどうかはチャンク全体について
+    1回の IN クエリで判定する。コミットは呼び出し側で行い、コミットできたら
+    返した company_keys を seen_keys に加えること（ロールバックしたチャンクの会社を
+    後のチャンクで重複扱いしないため）。
+    """
+    df = df.copy()
+    for column in REQUIRED_COLUMNS:
+        df[column] = _text_column(df, column)
+    valid = df.dropna(subset=list(REQUIRED_COLUMNS))
+    failed = len(df) - len(valid)
+
+    valid = valid.assign(company_key=valid["company_name"].map(normalize_company_name))
+    unique = valid.drop_duplicates(subset="company_key")
+    unique = unique[~unique["company_key"].isin(seen_keys)]
+
+    existing = find_customer_ids(db, unique["company_key"])
+    new_df = unique[~unique["company_key"].isin(existing.keys())]
+    bulk_insert_customers(db, customer_rows(new_df, last_contact_method))
+    return (
+        len(new_df),
+        len(unique) - len(new_df),
+        len(valid) - len(unique),
+        failed,
+        set(unique["company_key"]),
+    )
+
+
+CARD_FIELDS = ("company_name", "personal_name", "contact_number", "email", "address")
+
+
+def import_card_chunk(db: Session, cards: List[dict]) -> Tuple[int, int, int]:
+    """名刺 OCR 結果のチャンクをまとめて登録し (cards, new_customers, matched) を返す。
+
+    会社の解決は正規化した会社名でチャンク全体を1回の IN クエリで引き、
+    未登録の会社はチャンク内で最初に出てきた名刺から顧客を作って一括登録する。
+    コミットは呼び出し側で行う。
+    """
+    for card in cards:
+        card["company_key"] = normalize_company_name(card["company_name"])
+
+    customer_ids = find_customer_ids(db, [card["company_key"] for card in cards])
+    matched = sum(1 for card in cards if card["company_key"] in customer_ids)
+
+    new_customers = {}
+    for card in cards:
+        key = card["company_key"]
+        if key in customer_ids or key in new_customers:
+            continue
+        new_customers[key] = {
+            "customer_name": card["personal_name"],
+            "company_name": card["company_name"],
+            "company_key": key,
+            "contact_number": card.get("contact_number") or None,
+            "email": card.get("email") or None,
+            "address": card.get("address") or None,
+            "total_purchase": 0.0,
+            "last_purchase_date": None,
+            "last_contact_method": "名刺",
+        }
+    customer_ids.update(bulk_insert_customers(db, list(new_customers.values())))
+
+    db.execute(insert(OcrCard.__table__), [
+        {
+            "customer_id": customer_ids.get(card["company_key"]),
+            "company_name": card["company_name"],
+            "personal_name": card["personal_name"],
+            "email": card.get("email") or None,
+            "contact_number": card.get("contact_number") or None,
+            "address": card.get("address") or None,
+        }
+        for card in cards
+    ])
+    return len(cards), len(new_customers), matched
@@ -0,0 +1,123 @@
+"""リクエスト単位の DB 計測。
+
+SQLAlchemy のイベントで、リクエストごとに発行した SQL の数・DB の実行時間・
+プールから接続を得るまでの待ち時間（pool_pre_ping の往復を含む）を集計する。
+集計先は ContextVar で、app/main.py のミドルウェアがリクエストの最初に用意し、
+結果をレスポンスヘッダー（X-DB-*, Server-Timing）とログ行に出す。
+同じ形の SQL（IN のプレースホルダー数の違いは同じとみなす）を N_PLUS_ONE_THRESHOLD 回より
+多く発行したリクエストは N+1 の疑いとして警告する。
+"""
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+ENABLED = os.getenv("DB_METRICS", "1") != "0"
+# 1 なら全リクエストの計測結果を1行ずつ出す（N+1 の警告は常に出す）
+LOG_REQUESTS = os.getenv("DB_METRICS_LOG", "0") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "pool_wait_seconds", "shapes")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self) -> Dict[str, int]:
+        """しきい値を超えて繰り返された SQL の形と回数。"""
+        return {shape: n for shape, n in self.shapes.items() if n > N_PLUS_ONE_THRESHOLD}
+
+    def headers(self) -> Dict[str, str]:
+        db_ms = self.db_seconds * 1000
+        wait_ms = self.pool_wait_seconds * 1000
+        headers = {
+            "X-DB-Statements": str(self.statements),
+            "X-DB-Time-Ms": f"{db_ms:.2f}",
+            "X-DB-Pool-Wait-Ms": f"{wait_ms:.2f}",
+            "Server-Timing": f"db;dur={db_ms:.2f}, db-pool;dur={wait_ms:.2f}",
+        }
+        repeated = self.repeated()
+        if repeated:
+            headers["X-DB-Repeated-Statements"] = str(max(repeated.values()))
+        return headers
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("db_request_stats", default=None)
+
+
+def start_request() -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(?)", _SPACES.sub(" ", statement).strip())
+
+
+def log_request(method: str, path: str, status: int, seconds: float, stats: RequestStats) -> None:
+    if LOG_REQUESTS:
+        print(f"db_metrics method={method} path={path} status={status} "
+              f"duration_ms={seconds * 1000:.1f} db_statements={stats.statements} "
+              f"db_time_ms={stats.db_seconds * 1000:.1f} "
+              f"db_pool_wait_ms={stats.pool_wait_seconds * 1000:.1f}")
+    for shape, n in stats.repeated().items():
+        print(f"[N+1 の疑い] {method} {path}: 同じ SQL を {n} 回発行しました: {shape[:200]}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("db_metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("db_metrics_start")
+    if starts:
+        stats.db_seconds += time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.shapes[statement_shape(statement)] += 1
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("db_metrics_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument(engine) -> None:
+    """同期エンジン（非同期エンジンなら sync_engine）に計測用のイベントを付ける。"""
+    if not ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    # プールには「取得を始めた」イベントがないため、connect() を包んで待ち時間を測る
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        stats = _current.get()
+        if stats is None:
+            return connect()
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            stats.pool_wait_seconds += time.perf_counter() - start
+
+    pool.connect = timed_connect
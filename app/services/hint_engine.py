@@ -0,0 +1,310 @@
+"""トークスクリプトのヒント生成。
+
+バックエンドは HINT_BACKEND で切り替える。
+  stub    顧客の状態から決まった文言を組み立てる（既定。外部呼び出しなし・テスト用にも使う）
+  openai  OpenAI 互換の chat/completions API（Ollama・vLLM などのローカル LLM を想定）を呼ぶ
+register_backend() で独自のバックエンドを追加できる。
+
+生成結果は、ヒントに効く顧客の状態（購入状況と直近の架電結果）のハッシュをキーに
+LRU + TTL のキャッシュに載せ、generated_hint テーブルにも保存してワーカー間で共有する
+（上位顧客の分は app/services/hint_prefetch.py が事前に作っておく）。
+架電を記録すると状態が変わってキーが変わるので、明示的に消さなくても次の表示で作り直される。
+同じキーの生成が同時に来た場合は1回だけ呼ぶ。
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import orjson
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.call_record import CallRecord
+from app.models.customer import Customer
+from app.models.generated_hint import GeneratedHint
+from app.services.call_history import batch_call_history_query, call_history_query
+
+HINT_BACKEND = os.getenv("HINT_BACKEND", "stub")
+HINT_CACHE_SIZE = int(os.getenv("HINT_CACHE_SIZE", "10000"))
+HINT_CACHE_TTL = float(os.getenv("HINT_CACHE_TTL", "86400"))
+# バックエンドが失敗したときは stub の文言を返し、この秒数だけ再試行を控える
+HINT_FAILURE_TTL = float(os.getenv("HINT_FAILURE_TTL", "30"))
+# ヒントの材料にする直近の架電数
+HINT_RECENT_CALLS = int(os.getenv("HINT_RECENT_CALLS", "5"))
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "qwen3:4b")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "300"))
+
+DEFAULT_HINT = "顧客のニーズに合わせた提案を心がけましょう。前回の会話内容を確認してから架電することをおすすめします。"
+
+SYSTEM_PROMPT = (
+    "あなたは法人向け営業のコールセンターで、オペレーターに架電前のトークのヒントを出すアシスタントです。"
+    "顧客の購入状況と直近の架電結果を踏まえ、次の架電で話すべきことを日本語2〜3文で簡潔に提案してください。"
+)
+
+
+def customer_state(customer: Customer, recent_calls: List[CallRecord], today: Optional[date] = None) -> Dict:
+    """ヒントに効く顧客の状態。キャッシュのキーとプロンプトの両方に使う。
+    最終購入日は経過月数にしておき、日付が変わるだけではキーが変わらないようにする。
+    """
+    today = today or date.today()
+    months = None
+    if customer.last_purchase_date:
+        months = (today.year - customer.last_purchase_date.year) * 12 + today.month - customer.last_purchase_date.month
+    return {
+        "company_name": customer.company_name or "",
+        "customer_name": customer.customer_name or "",
+        "total_purchase": customer.total_purchase or 0.0,
+        "months_since_purchase": months,
+        "last_contact_method": customer.last_contact_method or "",
+        "recent_calls": [
+            {"date": record.call_date.isoformat(), "result": record.call_result or ""}
+            for record in recent_calls
+        ],
+    }
+
+
+def state_key(state: Dict) -> str:
+    body = orjson.dumps(state, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha1(f"{HINT_BACKEND}:{LLM_MODEL}:".encode() + body).hexdigest()
+
+
+class StubBackend:
+    """状態だけから決まる文言を返す。同じ状態なら必ず同じヒントになる。"""
+
+    name = "stub"
+
+    async def generate(self, state: Dict) -> str:
+        calls = state["recent_calls"]
+        months = state["months_since_purchase"]
+        company = state["company_name"]
+        if not calls:
+            return f"初めての架電です。{company}様の事業内容と現在の課題を伺うところから始めましょう。"
+        latest = calls[0]
+        result = latest["result"]
+        if "不在" in result:
+            absent = sum(1 for call in calls if "不在" in call["result"])
+            return (f"前回（{latest['date']}）は{result}でした（直近{len(calls)}回中{absent}回）。"
+                    "前回と違う時間帯に架電し、担当者の在席しやすい時間を確認しましょう。")
+        if "資料" in result:
+            return "資料送付後のフォローアップのタイミングです。資料の感想を確認し、具体的な導入スケジュールについて話を進めましょう。"
+        if "見積" in result or "検討" in result:
+            return f"前回は「{result}」でした。検討状況と判断のポイントを確認し、疑問点を解消しましょう。"
+        if "折り返し" in result or "再コール" in result:
+            return f"前回（{latest['date']}）に{result}をいただいています。お約束の件であることを最初に伝えましょう。"
+        if months is not None and months >= 3:
+            return (f"最終購入から{months}ヶ月が経過しています。"
+                    "新製品ラインのご案内と、保守サービスについて提案してみましょう。")
+        return DEFAULT_HINT
+
+
+class OpenAICompatibleBackend:
+    """OpenAI 互換の /chat/completions を呼ぶ。"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = LLM_BASE_URL, model: str = LLM_MODEL, api_key: str = LLM_API_KEY,
+                 timeout: float = LLM_TIMEOUT):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.model = model
+        self._client = httpx.AsyncClient(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+
+    @staticmethod
+    def prompt(state: Dict) -> str:
+        calls = "\n".join(f"- {call['date']}: {call['result']}" for call in state["recent_calls"]) or "- なし"
+        months = state["months_since_purchase"]
+        return (
+            f"会社名: {state['company_name']}\n"
+            f"担当者: {state['customer_name']}\n"
+            f"累積購入金額: {state['total_purchase']:,.0f}円\n"
+            f"最終購入からの経過: {'購入履歴なし' if months is None else f'{months}ヶ月'}\n"
+            f"最終接点: {state['last_contact_method'] or '不明'}\n"
+            f"直近の架電結果（新しい順）:\n{calls}"
+        )
+
+    async def generate(self, state: Dict) -> str:
+        response = await self._client.post("/chat/completions", json={
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": self.prompt(state)},
+            ],
+            "temperature": 0.2,
+            "max_tokens": LLM_MAX_TOKENS,
+        })
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+BACKENDS: Dict[str, Callable] = {
+    StubBackend.name: StubBackend,
+    OpenAICompatibleBackend.name: OpenAICompatibleBackend,
+}
+
+_backend = None
+_fallback = StubBackend()
+_lock = threading.Lock()
+# キー -> (期限, ヒント)。末尾ほど最近使ったもの
+_entries: "OrderedDict[str, tuple]" = OrderedDict()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def register_backend(name: str, factory: Callable) -> None:
+    """HINT_BACKEND=name で使えるバックエンドを登録する。factory は generate(state) を持つオブジェクトを返す。"""
+    BACKENDS[name] = factory
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        try:
+            factory = BACKENDS[HINT_BACKEND]
+        except KeyError:
+            raise ValueError(f"未知の HINT_BACKEND です: {HINT_BACKEND}")
+        _backend = factory()
+    return _backend
+
+
+async def close() -> None:
+    global _backend
+    if _backend is not None and hasattr(_backend, "close"):
+        await _backend.close()
+    _backend = None
+
+
+def cached(key: str) -> Optional[str]:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return entry[1]
+
+
+def _store(key: str, hint: str, ttl: float) -> None:
+    with _lock:
+        _entries[key] = (time.monotonic() + ttl, hint)
+        _entries.move_to_end(key)
+        while len(_entries) > HINT_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+async def _persist(key: str, customer_id: int, hint: str) -> None:
+    """生成したヒントを generated_hint に書き、他のワーカーからも使えるようにする。"""
+    from app.database import AsyncSessionLocal
+
+    now = datetime.now()
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.merge(GeneratedHint(
+                state_key=key, customer_id=customer_id, hint=hint,
+                created_at=now, expires_at=now + timedelta(seconds=HINT_CACHE_TTL),
+            ))
+            await db.commit()
+    except Exception as e:
+        # 別ワーカーが同じキーを同時に書いた場合など。メモリのキャッシュには載っているので続ける
+        print("生成したヒントの保存に失敗しました:", str(e) or type(e).__name__)
+
+
+async def _generate(key: str, state: Dict, customer_id: Optional[int]) -> str:
+    try:
+        hint = await get_backend().generate(state)
+    except Exception as e:
+        print("ヒントの生成に失敗しました（stub の文言を返します）:", str(e) or type(e).__name__)
+        hint = await _fallback.generate(state)
+        _store(key, hint, HINT_FAILURE_TTL)
+        return hint
+    _store(key, hint, HINT_CACHE_TTL)
+    if customer_id is not None:
+        await _persist(key, customer_id, hint)
+    return hint
+
+
+async def stored_hints(db: AsyncSession, keys: List[str]) -> Dict[str, str]:
+    """generated_hint に保存済みで期限内のヒントをメモリのキャッシュにも載せて返す。"""
+    if not keys:
+        return {}
+    now = datetime.now()
+    rows = (await db.execute(
+        select(GeneratedHint.state_key, GeneratedHint.hint, GeneratedHint.expires_at)
+        .where(GeneratedHint.state_key.in_(keys), GeneratedHint.expires_at > now)
+    )).all()
+    for key, hint, expires_at in rows:
+        _store(key, hint, (expires_at - now).total_seconds())
+    return {key: hint for key, hint, _ in rows}
+
+
+async def hint_for_state(state: Dict, customer_id: Optional[int] = None,
+                         db: Optional[AsyncSession] = None) -> str:
+    """状態に対するヒントを返す。メモリのキャッシュ、（db があれば）generated_hint の順に探し、
+    なければ生成する（同じキーの同時生成は1回にまとめる）。customer_id があれば生成結果を保存する。
+    """
+    key = state_key(state)
+    hint = cached(key)
+    if hint is None and db is not None:
+        hint = (await stored_hints(db, [key])).get(key)
+    if hint is not None:
+        return hint
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_generate(key, state, customer_id))
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def load_state(db: AsyncSession, customer_id: int) -> Optional[Dict]:
+    customer = await db.get(Customer, customer_id)
+    if customer is None:
+        return None
+    recent_calls = (await db.execute(call_history_query(customer_id, limit=HINT_RECENT_CALLS))).scalars().all()
+    return customer_state(customer, recent_calls)
+
+
+async def load_states(db: AsyncSession, customer_ids: List[int]) -> Dict[int, Dict]:
+    """複数顧客の状態を2回のクエリで読む（存在しない顧客は含まない）。"""
+    customers = (await db.execute(
+        select(Customer).where(Customer.customer_id.in_(customer_ids))
+    )).scalars().all()
+    calls = defaultdict(list)
+    for record in (await db.execute(batch_call_history_query(customer_ids, HINT_RECENT_CALLS))).scalars():
+        calls[record.customer_id].append(record)
+    today = date.today()
+    return {c.customer_id: customer_state(c, calls[c.customer_id], today) for c in customers}
+
+
+async def hint_for_customer(db: AsyncSession, customer_id: int) -> str:
+    state = await load_state(db, customer_id)
+    if state is None:
+        return DEFAULT_HINT
+    return await hint_for_state(state, customer_id, db)
+
+
+async def purge_expired() -> int:
+    """期限切れの generated_hint を消し、消した件数を返す。"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(GeneratedHint).where(GeneratedHint.expires_at <= datetime.now()))
+        await db.commit()
+        return result.rowcount or 0
@@ -0,0 +1,158 @@
+"""優先リスト上位の顧客のヒントを事前に生成するバックグラウンド処理。
+
+オペレーターは優先リストの上から顧客詳細を開くため、上位 HINT_PREFETCH_TOP_N 件の
+ヒントを HINT_PREFETCH_INTERVAL 秒ごとに作っておき、初回表示でも生成を待たないようにする。
+生成済み（メモリのキャッシュか generated_hint に期限内のものがある）の顧客は飛ばし、
+状態が変わった（架電が記録された）顧客だけを作り直す。
+生成は HINT_PREFETCH_CONCURRENCY 件まで並行し、開始を毎秒 HINT_PREFETCH_RATE 件までに抑える。
+一覧を読んでから生成するまでに他のワーカーや画面からの表示で作られていることがあるため、
+各顧客の生成の直前にもプライマリの generated_hint を確認する。
+結果は hint_engine のキャッシュと generated_hint に入り、/api/script-hint がそのまま返す。
+
+起動時に start() でイベントループ上のタスクとして動かす（HINT_PREFETCH_INTERVAL=0 で無効）。
+複数ワーカーで同じ顧客を生成しないよう、task_lease のリースを取れたワーカーだけが実行する。
+cron などから1回だけ実行する場合: python -m app.services.hint_prefetch
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+
+from app.services import hint_engine, task_lease
+from app.services.priority_service import priority_list_query
+
+HINT_PREFETCH_TOP_N = int(os.getenv("HINT_PREFETCH_TOP_N", "200"))
+HINT_PREFETCH_INTERVAL = float(os.getenv("HINT_PREFETCH_INTERVAL", "300"))
+HINT_PREFETCH_CONCURRENCY = int(os.getenv("HINT_PREFETCH_CONCURRENCY", "4"))
+# 1秒あたりに開始する生成の上限（0 なら制限しない）
+HINT_PREFETCH_RATE = float(os.getenv("HINT_PREFETCH_RATE", "2"))
+
+LEASE_NAME = "hint_prefetch"
+# 持っているワーカーは周期ごとに延長する。止まったワーカーの分は期限切れで他が引き継ぐ
+LEASE_TTL = 2 * HINT_PREFETCH_INTERVAL
+
+_task: Optional[asyncio.Task] = None
+
+
+class RateLimiter:
+    """生成の開始を 1/rate 秒以上の間隔に並べる。"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self.interval
+
+
+async def _acquire_lease() -> bool:
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(task_lease.acquire, LEASE_NAME, LEASE_TTL)
+
+
+async def _release_lease() -> None:
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(task_lease.release, LEASE_NAME)
+
+
+async def prefetch_once(top_n: int = HINT_PREFETCH_TOP_N) -> Dict[str, int]:
+    """上位 top_n 件のうちヒントが未生成の顧客の分を生成し、件数を返す。"""
+    from app.database import AsyncReadSessionLocal, AsyncSessionLocal
+
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(priority_list_query(limit=top_n))).all()
+        customer_ids = [row.customer_id for row in rows]
+        states = await hint_engine.load_states(db, customer_ids)
+        keys = {customer_id: hint_engine.state_key(state) for customer_id, state in states.items()}
+        missing = [key for key in keys.values() if hint_engine.cached(key) is None]
+        stored = await hint_engine.stored_hints(db, missing)
+
+    # stored_hints で保存済みの分もメモリのキャッシュに載っている
+    pending = [customer_id for customer_id, key in keys.items() if hint_engine.cached(key) is None]
+    semaphore = asyncio.Semaphore(HINT_PREFETCH_CONCURRENCY)
+    limiter = RateLimiter(HINT_PREFETCH_RATE)
+
+    async def generate(customer_id: int) -> bool:
+        key = keys[customer_id]
+        async with semaphore:
+            # 生成中はセッションを持たないよう、確認だけ短いセッションで行う（レプリカの遅れを避けてプライマリ）
+            async with AsyncSessionLocal() as db:
+                if hint_engine.cached(key) is not None or await hint_engine.stored_hints(db, [key]):
+                    return False
+            await limiter.wait()
+            await hint_engine.hint_for_state(states[customer_id], customer_id)
+            return True
+
+    generated = sum(await asyncio.gather(*(generate(customer_id) for customer_id in pending)))
+    return {
+        "customers": len(states),
+        "generated": generated,
+        "from_store": len(stored) + len(pending) - generated,
+    }
+
+
+async def _run() -> None:
+    # 複数ワーカーが同時に起動したときにリースの取り合いにならないよう、開始を少しずらす
+    await asyncio.sleep(random.uniform(0, min(HINT_PREFETCH_INTERVAL, 5)))
+    while True:
+        start = time.monotonic()
+        try:
+            if await _acquire_lease():
+                result = await prefetch_once()
+                purged = await hint_engine.purge_expired()
+                # 次の周期まで持ち続けるよう、終わった時点から延長する
+                await _acquire_lease()
+                if result["generated"] or purged:
+                    print(f"ヒントを事前生成しました: 上位{result['customers']}件中 {result['generated']}件"
+                          f"（{time.monotonic() - start:.1f}秒、期限切れ削除 {purged}件）")
+        except Exception as e:
+            print("ヒントの事前生成に失敗しました:", str(e) or type(e).__name__)
+        await asyncio.sleep(HINT_PREFETCH_INTERVAL)
+
+
+def start() -> Optional[asyncio.Task]:
+    global _task
+    if HINT_PREFETCH_INTERVAL > 0 and HINT_PREFETCH_TOP_N > 0 and _task is None:
+        _task = asyncio.get_running_loop().create_task(_run(), name="hint-prefetch")
+    return _task
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+        try:
+            # 止めるワーカーのリースはすぐに他のワーカーが引き継げるようにする
+            await _release_lease()
+        except Exception as e:
+            print("ヒント事前生成のリースを解放できませんでした:", str(e) or type(e).__name__)
+
+
+if __name__ == "__main__":
+    async def _main():
+        from app.database import dispose_engines
+
+        try:
+            print(await prefetch_once())
+        finally:
+            await hint_engine.close()
+            await dispose_engines()
+
+    asyncio.run(_main())
@@ -0,0 +1,207 @@
+"""バックグラウンド取込ジョブ。
+
+アップロードされたファイルを IMPORT_UPLOAD_DIR に保存して import_job にジョブを登録し、
+IMPORT_WORKERS 個のプロセスプールで取込を実行する。進捗は import_job に書き込むので、
+どのワーカーからでも GET /api/import/jobs/{job_id} で参照できる。
+別プロセスで取り込むため、優先リストのキャッシュは PRIORITY_CACHE_TTL で更新される。
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.import_job import ImportJob
+
+UPLOAD_DIR = Path(os.getenv("IMPORT_UPLOAD_DIR", Path(tempfile.gettempdir()) / "call_recommend_imports"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+COPY_BUFFER_SIZE = 1024 * 1024
+
+JOB_KINDS = {".csv": "csv", ".xlsx": "excel", ".xlsm": "excel"}
+LAST_CONTACT_METHODS = {"csv": "CSV取込", "excel": "Excel取込"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def job_kind_for(filename: str) -> Optional[str]:
+    return JOB_KINDS.get(Path(filename or "").suffix.lower())
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # fork だと親プロセスの DB コネクションを共有してしまうため spawn を使う
+            _executor = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def job_to_dict(job: ImportJob) -> Dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "filename": job.filename or "",
+        "status": job.status,
+        "processed": job.processed,
+        "imported": job.imported,
+        "skipped": job.skipped,
+        "duplicates": job.duplicates,
+        "failed": job.failed,
+        "error": job.error or "",
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+
+def submit_job(db: Session, fileobj: BinaryIO, filename: str, kind: str) -> ImportJob:
+    """アップロードをディスクに保存し、ジョブを登録してプロセスプールに投入する。"""
+    job_id = uuid.uuid4().hex
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = UPLOAD_DIR / f"{job_id}{Path(filename).suffix.lower()}"
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, COPY_BUFFER_SIZE)
+
+    now = datetime.now()
+    job = ImportJob(
+        job_id=job_id,
+        kind=kind,
+        filename=filename,
+        status="queued",
+        processed=0,
+        imported=0,
+        skipped=0,
+        duplicates=0,
+        failed=0,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    db.commit()
+
+    future = _get_executor().submit(run_import_job, job_id, str(path), kind)
+    future.add_done_callback(partial(_finish_job, job_id, path, kind))
+    return job
+
+
+def _update_job(db: Session, job_id: str, **values) -> None:
+    db.query(ImportJob).filter(ImportJob.job_id == job_id).update(
+        dict(values, updated_at=datetime.now()), synchronize_session=False
+    )
+    db.commit()
+
+
+def _iter_chunks(kind: str, fileobj: BinaryIO):
+    from app.services.customer_import import iter_csv_chunks, iter_excel_chunks
+
+    if kind == "csv":
+        return iter_csv_chunks(fileobj)
+    if kind == "excel":
+        return iter_excel_chunks(fileobj)
+    raise ValueError(f"未対応のジョブ種別です: {kind}")
+
+
+def _finish_job(job_id: str, path: Path, kind: str, future) -> None:
+    """ジョブの完了時に親プロセスで呼ばれる。
+
+    取込はプール側のプロセスで動くので、件数と所要時間はここで記録する。
+    run_import_job が最後まで動かなかった場合（shutdown_executor での取り消しや、
+    ワーカーの異常終了による BrokenProcessPool）はジョブが queued / running のまま
+    残るため、失敗にしてアップロードされたファイルを消す。
+    """
+    from app.database import SessionLocal
+    from app.services import metrics
+
+    if future.cancelled():
+        error = "サーバーの停止により取込が取り消されました"
+    elif future.exception() is not None:
+        error = f"取込プロセスが異常終了しました: {future.exception()!r}"
+    else:
+        imported, seconds = future.result()
+        metrics.record_import(f"job_{kind}", imported, seconds)
+        return
+
+    try:
+        db = SessionLocal()
+        try:
+            db.query(ImportJob).filter(
+                ImportJob.job_id == job_id, ImportJob.status.in_(("queued", "running"))
+            ).update({"status": "failed", "error": error, "updated_at": datetime.now()},
+                     synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"取込ジョブ {job_id} の状態を更新できませんでした:", e)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def run_import_job(job_id: str, path: str, kind: str) -> Tuple[int, float]:
+    """プロセスプール上で実行される取込本体。チャンクごとに進捗を書き込む。
+    取り込んだ件数と所要時間を返す。
+    """
+    from app.database import SessionLocal
+    from app.services.customer_import import import_customer_chunk
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    processed = imported = skipped = duplicates = failed = 0
+    seen_keys = set()
+    try:
+        _update_job(db, job_id, status="running")
+        with open(path, "rb") as fileobj:
+            for chunk in _iter_chunks(kind, fileobj):
+                try:
+                    (chunk_imported, chunk_skipped, chunk_duplicates,
+                     chunk_failed, chunk_keys) = import_customer_chunk(
+                        db, chunk, seen_keys, LAST_CONTACT_METHODS[kind]
+                    )
+                    db.commit()
+                    seen_keys.update(chunk_keys)
+                except Exception:
+                    db.rollback()
+                    chunk_imported, chunk_skipped, chunk_duplicates, chunk_failed = 0, 0, 0, len(chunk)
+                processed += len(chunk)
+                imported += chunk_imported
+                skipped += chunk_skipped
+                duplicates += chunk_duplicates
+                failed += chunk_failed
+                _update_job(
+                    db, job_id,
+                    processed=processed, imported=imported, skipped=skipped,
+                    duplicates=duplicates, failed=failed,
+                )
+        _update_job(db, job_id, status="succeeded")
+    except Exception as e:
+        db.rollback()
+        _update_job(db, job_id, status="failed", error=str(e))
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return imported, time.perf_counter() - start
@@ -1,16 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_read_db
+from app.schemas import ScriptHint
+from app.services import hint_engine
 
 router = APIRouter()
 
 
-@router.get("/script-hint")
-def generate_script_hint(customer_id: int = 0):
-    """トークスクリプトのヒントを返す。プロトタイプでは固定文言を使用"""
-    # 実際にはLLM APIを呼び出してcustomer_idに応じたヒントを生成する
-    hints = {
-        1: "最終購入から3ヶ月が経過しています。新製品ラインのご案内と、前回の商談でご興味を持たれた保守サービスについて提案してみましょう。",
-        2: "資料送付後のフォローアップのタイミングです。資料の感想を確認し、具体的な導入スケジュールについて話を進めましょう。",
-    }
-    return {
-        "hint": hints.get(customer_id, "顧客のニーズに合わせた提案を心がけましょう。前回の会話内容を確認してから架電することをおすすめします。")
-    }
+@router.get("/script-hint", response_model=ScriptHint)
+async def generate_script_hint(customer_id: int = 0, db: AsyncSession = Depends(get_read_db)):
+    """トークスクリプトのヒントを返す。生成とキャッシュは app/services/hint_engine.py を参照。"""
+    return {"hint": await hint_engine.hint_for_customer(db, customer_id)}
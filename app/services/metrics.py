@@ -0,0 +1,142 @@
+"""プロセス内で集計する Prometheus 形式のメトリクス。
+
+外部サービスやライブラリは使わず、app/main.py のミドルウェアがリクエストごとに
+ルートのテンプレート（/api/customer/{customer_id} など）単位で件数・エラー・所要時間を記録し、
+取込ルーターが取込件数と所要時間を記録する。GET /metrics で render() の結果を返す。
+値はワーカープロセスごとなので、複数ワーカーで動かす場合は Prometheus 側で合算する。
+"""
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+# どのルートにも一致しなかったリクエスト（404）。パスをそのままラベルにすると種類が増え続けるため
+UNMATCHED_ROUTE = "unmatched"
+
+_lock = threading.Lock()
+# (method, route) -> [バケットごとの件数..., +Inf の件数], 合計秒
+_latency_counts: Dict[Tuple[str, str], List[int]] = {}
+_latency_sums: Dict[Tuple[str, str], float] = defaultdict(float)
+_requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+_errors: Dict[Tuple[str, str], int] = defaultdict(int)
+_import_rows: Dict[str, int] = defaultdict(int)
+_import_seconds: Dict[str, float] = defaultdict(float)
+_import_last_rate: Dict[str, float] = {}
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    key = (method, route)
+    with _lock:
+        counts = _latency_counts.get(key)
+        if counts is None:
+            counts = _latency_counts[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+        counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        _latency_sums[key] += seconds
+        _requests[(method, route, str(status))] += 1
+        if status >= 500:
+            _errors[key] += 1
+
+
+def record_import(kind: str, rows: int, seconds: float) -> None:
+    """取込1回分の件数と所要時間を記録する（kind は csv / excel / call_records / cards / job_csv など）。"""
+    with _lock:
+        _import_rows[kind] += rows
+        _import_seconds[kind] += seconds
+        if seconds > 0:
+            _import_last_rate[kind] = rows / seconds
+
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+_POOL_METRICS = (
+    ("db_pool_size", "Configured number of pooled connections.", lambda pool: pool.size()),
+    ("db_pool_checked_out", "Connections currently checked out of the pool.", lambda pool: pool.checkedout()),
+    ("db_pool_overflow", "Connections opened beyond pool_size.", lambda pool: max(0, pool.overflow())),
+)
+
+
+def _pool_lines(engines: Dict[str, object]) -> List[str]:
+    # QueuePool 系以外（SQLite のメモリ DB など）は数を持たないので出さない
+    pools = [(name, engine.pool) for name, engine in engines.items() if hasattr(engine.pool, "checkedout")]
+    lines = []
+    # テキスト形式では1つのメトリクスの HELP・TYPE・サンプルをまとめて出す必要がある
+    for metric, help_text, value in _POOL_METRICS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for name, pool in pools:
+            lines.append(f"{metric}{_labels(engine=name)} {value(pool)}")
+    return lines
+
+
+def render(engines: Dict[str, object]) -> str:
+    """Prometheus のテキスト形式（version 0.0.4）で全メトリクスを返す。engines は名前 -> 同期エンジン。"""
+    with _lock:
+        latency = {key: (list(counts), _latency_sums[key]) for key, counts in _latency_counts.items()}
+        requests = dict(_requests)
+        errors = dict(_errors)
+        import_rows = dict(_import_rows)
+        import_seconds = dict(_import_seconds)
+        import_rates = dict(_import_last_rate)
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), (counts, total) in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route)} {total}")
+        lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route)} {cumulative}")
+
+    lines += [
+        "# HELP http_requests_total Requests by route template and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(requests.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP http_request_errors_total Requests that ended in a 5xx or an unhandled exception.",
+        "# TYPE http_request_errors_total counter",
+    ]
+    for (method, route), count in sorted(errors.items()):
+        lines.append(f"http_request_errors_total{_labels(method=method, route=route)} {count}")
+
+    lines += [
+        "# HELP import_rows_total Rows imported by the import endpoints and jobs.",
+        "# TYPE import_rows_total counter",
+    ]
+    for kind, rows in sorted(import_rows.items()):
+        lines.append(f"import_rows_total{_labels(kind=kind)} {rows}")
+    lines += [
+        "# HELP import_seconds_total Time spent importing (rate(import_rows_total) / rate(import_seconds_total) is rows/s).",
+        "# TYPE import_seconds_total counter",
+    ]
+    for kind, seconds in sorted(import_seconds.items()):
+        lines.append(f"import_seconds_total{_labels(kind=kind)} {seconds}")
+    lines += [
+        "# HELP import_rows_per_second Throughput of the most recent import.",
+        "# TYPE import_rows_per_second gauge",
+    ]
+    for kind, rate in sorted(import_rates.items()):
+        lines.append(f"import_rows_per_second{_labels(kind=kind)} {rate}")
+
+    lines += _pool_lines(engines)
+    return "\n".join(lines) + "\n"
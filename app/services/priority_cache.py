@@ -0,0 +1,75 @@
+"""架電優先リストのプロセス内キャッシュ。
+
+キーには日付を含めるため、経過日数が変わる日付の切り替わりで自然に無効になる。
+/api/call-record と /api/import/* は書き込み後に invalidate() を呼ぶ。
+別ワーカーでの書き込みは検知できないため、PRIORITY_CACHE_TTL 秒で期限切れにする。
+レプリカから読んだ結果は、invalidate() からレプリカの遅れ（replica_lag 秒）のあいだは
+書き込み前の内容かもしれないので載せない。
+レスポンス本文は載せるときに一度だけ orjson でシリアライズし、ヒット時はそのまま返す。
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import date
+from typing import Hashable, List, NamedTuple, Optional
+
+import orjson
+
+CACHE_TTL = float(os.getenv("PRIORITY_CACHE_TTL", "30"))
+MAX_ENTRIES = 256
+
+_version = 0
+_invalidated_at = float("-inf")
+_entries = {}
+_lock = threading.Lock()
+
+
+class CachedList(NamedTuple):
+    stored_at: float
+    etag: str
+    body: bytes
+
+
+def current_version() -> int:
+    return _version
+
+
+def make_etag(body: bytes) -> str:
+    """レスポンス本文から ETag を作る。"""
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def get(key: Hashable) -> Optional[CachedList]:
+    full_key = (date.today(), key)
+    entry = _entries.get(full_key)
+    if entry is None:
+        return None
+    if time.monotonic() - entry.stored_at > CACHE_TTL:
+        _entries.pop(full_key, None)
+        return None
+    return entry
+
+
+def put(key: Hashable, rows: List[dict], version: int, replica_lag: float = 0.0) -> CachedList:
+    """計算開始時点の世代 version のまま書き込みがなく、最後の書き込みから
+    replica_lag 秒以上たっていればキャッシュに載せる（プライマリから読んだ結果は 0 を渡す）。
+    載せなかった場合もレスポンス用のエントリは返す。
+    """
+    body = orjson.dumps(rows)
+    entry = CachedList(time.monotonic(), make_etag(body), body)
+    with _lock:
+        if version == _version and entry.stored_at - _invalidated_at >= replica_lag:
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.clear()
+            _entries[(date.today(), key)] = entry
+    return entry
+
+
+def invalidate() -> None:
+    """書き込みがあったときに呼ぶ。"""
+    global _version, _invalidated_at
+    with _lock:
+        _version += 1
+        _invalidated_at = time.monotonic()
+        _entries.clear()
@@ -0,0 +1,269 @@
+"""customer_priority テーブルの維持処理。
+
+書き込み系エンドポイントは影響を受けた顧客だけを refresh_priority で更新し、
+日付が変わったときの経過日数（recency 項）の更新は rebuild_priority でまとめて行う。
+最新架電日は customer.latest_call_date（書き込み時に更新する非正規化列）を使う。
+作り直しは task_lease のリースを取れたワーカーだけが行い、他のワーカーは確認済みにするだけにする。
+customer_priority を優先度順に読むクエリ（priority_list_query）もここに置く。
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Date, Integer, and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from app.models.customer import Customer
+from app.models.customer_priority import CustomerPriority
+from app.services import priority_cache, task_lease
+from app.services.bulk_insert import executemany_insert, iso_date
+from app.services.scoring_engine import days_since_expression, score_batch, score_expression
+
+CHUNK_SIZE = 1000
+REBUILD_CHUNK_SIZE = 10000
+PRIORITY_COLUMNS = ("customer_id", "latest_call_date", "days_since_last_call", "score", "scored_on")
+
+ROLLOVER_LEASE_NAME = "priority_rollover"
+# 作り直しにかかる時間より長くする。終わったら解放する
+ROLLOVER_LEASE_TTL = float(os.getenv("PRIORITY_ROLLOVER_LEASE_TTL", "1800"))
+
+# このワーカーでロールオーバー済みを確認した日付
+_checked_on: Optional[date] = None
+_lock = threading.Lock()
+
+
+class days_between(FunctionElement):
+    """2つの日付の差（日数）。MySQL と SQLite で関数が異なるためコンパイル時に切り替える。"""
+
+    type = Integer()
+    inherit_cache = True
+    name = "days_between"
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "(%s - %s)" % (compiler.process(end, **kw), compiler.process(start, **kw))
+
+
+@compiles(days_between, "mysql")
+def _days_between_mysql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "DATEDIFF(%s, %s)" % (compiler.process(end, **kw), compiler.process(start, **kw))
+
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "CAST(julianday(%s) - julianday(%s) AS INTEGER)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+def _scoring_select(where):
+    """customer_priority に入れる行を DB 側で計算する SELECT を組み立てる。"""
+    today = bindparam("today", type_=Date())
+    inputs = (
+        select(
+            Customer.customer_id,
+            Customer.total_purchase,
+            Customer.latest_call_date,
+        )
+        .where(where)
+        .subquery()
+    )
+    days_since_last_call = days_since_expression(
+        inputs.c.latest_call_date,
+        days_between(inputs.c.latest_call_date, today),
+    )
+    score = score_expression(inputs.c.total_purchase, days_since_last_call)
+    return select(
+        inputs.c.customer_id,
+        inputs.c.latest_call_date,
+        days_since_last_call,
+        score,
+        today,
+    )
+
+
+def _insert_scores(db: Session, where, today: date) -> None:
+    stmt = insert(CustomerPriority.__table__).from_select(
+        ["customer_id", "latest_call_date", "days_since_last_call", "score", "scored_on"],
+        _scoring_select(where),
+    )
+    db.execute(stmt, {"today": today})
+
+
+def refresh_priority(db: Session, customer_ids: Iterable[int], today: Optional[date] = None) -> None:
+    """指定した顧客のスコアだけを再計算する。コミットは呼び出し側で行う。"""
+    today = today or date.today()
+    ids = sorted({cid for cid in customer_ids if cid is not None})
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        db.query(CustomerPriority).filter(
+            CustomerPriority.customer_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        _insert_scores(db, Customer.customer_id.in_(chunk), today)
+
+
+def update_latest_call_dates(db: Session, latest_dates: Dict[int, date]) -> None:
+    """customer.latest_call_date を新しい架電日で進め、該当顧客のスコアを更新する。
+    架電履歴の一括登録ではバッチごとに1回だけ呼ぶ。コミットは呼び出し側で行う。
+    """
+    if not latest_dates:
+        return
+    db.execute(
+        update(Customer.__table__)
+        .where(Customer.customer_id == bindparam("target_id"))
+        .where(or_(
+            Customer.latest_call_date.is_(None),
+            Customer.latest_call_date < bindparam("call_date"),
+        ))
+        .values(latest_call_date=bindparam("call_date")),
+        [
+            {"target_id": customer_id, "call_date": call_date}
+            for customer_id, call_date in latest_dates.items()
+        ],
+    )
+    refresh_priority(db, latest_dates.keys())
+
+
+def rebuild_priority(db: Session, today: Optional[date] = None) -> None:
+    """全顧客のスコアを作り直す（日次ロールオーバー・初期構築用）。
+    顧客IDの範囲ごとに列データを取得し、scoring_engine でまとめて計算する。
+    """
+    today = today or date.today()
+    db.query(CustomerPriority).delete(synchronize_session=False)
+    max_id = db.query(func.max(Customer.customer_id)).scalar() or 0
+    for start in range(0, max_id, REBUILD_CHUNK_SIZE):
+        rows = (
+            db.query(
+                Customer.customer_id,
+                Customer.total_purchase,
+                Customer.latest_call_date,
+            )
+            .filter(Customer.customer_id.between(start + 1, start + REBUILD_CHUNK_SIZE))
+            .all()
+        )
+        if not rows:
+            continue
+        customer_ids, total_purchases, latest_call_dates = zip(*rows)
+        days, scores = score_batch(total_purchases, latest_call_dates, today)
+        scored_on = iso_date(today)
+        executemany_insert(db, CustomerPriority.__table__, PRIORITY_COLUMNS, [
+            (customer_id, iso_date(latest_call_date), days_since_last_call, score, scored_on)
+            for customer_id, latest_call_date, days_since_last_call, score
+            in zip(customer_ids, latest_call_dates, days.tolist(), scores.tolist())
+        ])
+    db.commit()
+    priority_cache.invalidate()
+
+
+def priority_checked_today() -> bool:
+    """このワーカーで今日のロールオーバーを確認済みなら True（DB には触れない）。"""
+    return _checked_on == date.today()
+
+
+def ensure_priority_current(db: Session) -> None:
+    """前日以前のスコアや未登録の顧客が残っていれば作り直す。
+    日付が変わると全ワーカーが同時にここへ来るため、作り直すのはリースを取れた1つだけにする。
+    """
+    global _checked_on
+    today = date.today()
+    if _checked_on == today:
+        return
+    with _lock:
+        if _checked_on == today:
+            return
+        stale = db.query(CustomerPriority.customer_id).filter(
+            CustomerPriority.scored_on < today
+        ).first()
+        missing = (
+            db.query(Customer.customer_id)
+            .outerjoin(CustomerPriority, Customer.customer_id == CustomerPriority.customer_id)
+            .filter(CustomerPriority.customer_id.is_(None))
+            .first()
+        )
+        if (stale or missing) and task_lease.acquire(db, ROLLOVER_LEASE_NAME, ROLLOVER_LEASE_TTL):
+            try:
+                rebuild_priority(db, today)
+            finally:
+                db.rollback()
+                task_lease.release(db, ROLLOVER_LEASE_NAME)
+        _checked_on = today
+
+
+# 優先リスト（/api/priority-list）とヒントの事前生成が同じ並び順で読むクエリ
+def priority_list_query(limit=None, after_score=None, after_id=None, q=None):
+    query = (
+        select(
+            Customer.customer_id,
+            Customer.customer_name,
+            Customer.company_name,
+            Customer.total_purchase,
+            CustomerPriority.days_since_last_call,
+            CustomerPriority.score,
+        )
+        .join(CustomerPriority, Customer.customer_id == CustomerPriority.customer_id)
+        .order_by(CustomerPriority.score.desc(), CustomerPriority.customer_id.desc())
+    )
+    if after_score is not None:
+        query = query.where(
+            or_(
+                CustomerPriority.score < after_score,
+                and_(
+                    CustomerPriority.score == after_score,
+                    CustomerPriority.customer_id < after_id,
+                ),
+            )
+        )
+    if q:
+        query = query.where(Customer.customer_name.contains(q, autoescape=True))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _seconds_until_next_day() -> float:
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds() + 1
+
+
+def start_rollover_scheduler() -> threading.Thread:
+    """日付が変わるたびにスコアを更新するデーモンスレッドを起動する。"""
+    from app.database import SessionLocal
+
+    def _run():
+        while True:
+            time.sleep(_seconds_until_next_day())
+            db = SessionLocal()
+            try:
+                ensure_priority_current(db)
+            except Exception as e:
+                print("優先度スコアの日次更新に失敗しました:", str(e))
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=_run, name="priority-rollover", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # cron などから日次ロールオーバーを実行する: python -m app.services.priority_service
+    from app.database import SessionLocal, engine
+    from app.models import create_tables
+
+    create_tables(engine)
+    session = SessionLocal()
+    try:
+        rebuild_priority(session)
+        print("優先度スコアを再計算しました。")
+    finally:
+        session.close()
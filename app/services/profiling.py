@@ -0,0 +1,151 @@
+"""リクエスト単位のオンデマンド・プロファイリング。
+
+PROFILING=1 のときだけ app/main.py がミドルウェアを登録する（無効時は何もしない）。
+有効時も、ヘッダー X-Profile またはクエリ ?profile= を付けたリクエスト（PROFILING_TOKEN を
+設定した場合はその値と一致するものだけ）と、PROFILING_SAMPLE_RATE の割合で選ばれた
+リクエストだけを計測する。
+
+PROFILING_MODE=sampling（既定）は PROFILING_INTERVAL_MS ごとにイベントループのスレッドと
+スレッドプールのワーカーのスタックを採り、flamegraph.pl / speedscope で読める
+collapsed 形式（"関数;関数;... 回数"）で保存する。待ち状態のスタックは除く。
+PROFILING_MODE=cprofile はイベントループのスレッドで cProfile を動かし、pstats 形式で保存する
+（スレッドプールで動く同期処理は含まれない）。
+どちらも同時に処理中の他のリクエストの分が混ざりうる。計測は同時に1リクエストまでで、
+計測中に来た他の指定は計測せずに通す。保存先は PROFILING_DIR で、
+ファイル名をレスポンスヘッダー X-Profile-File で返す。
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+ENABLED = os.getenv("PROFILING", "0") == "1"
+MODE = os.getenv("PROFILING_MODE", "sampling")
+TOKEN = os.getenv("PROFILING_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", "1")) / 1000
+PROFILE_DIR = Path(os.getenv("PROFILING_DIR", Path(tempfile.gettempdir()) / "call_recommend_profiles"))
+
+# 葉がこれらの関数のスタックは、I/O やキューを待っているだけなので数えない
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+# anyio がスレッドプール（run_in_threadpool・同期エンドポイント）に使うスレッドのクラス名
+WORKER_THREAD_CLASS = "WorkerThread"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+_active = threading.Lock()
+
+
+def requested(request) -> bool:
+    """このリクエストを計測するか。"""
+    value = request.headers.get("x-profile") or request.query_params.get("profile")
+    if value is not None:
+        return not TOKEN or value == TOKEN
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def begin(request) -> Optional["RequestProfiler"]:
+    """計測対象なら計測を始めたプロファイラを、そうでなければ None を返す。"""
+    if not requested(request) or not _active.acquire(blocking=False):
+        return None
+    profiler = RequestProfiler()
+    try:
+        profiler.start()
+    except Exception:
+        _active.release()
+        raise
+    return profiler
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """別スレッドから一定間隔で対象スレッドのスタックを採り、collapsed 形式で数える。"""
+
+    def __init__(self, loop_thread: int, interval: float):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _targets(self) -> set:
+        targets = {self.loop_thread}
+        targets.update(t.ident for t in threading.enumerate() if type(t).__name__ == WORKER_THREAD_CLASS)
+        return targets
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            targets = self._targets()
+            for ident, frame in sys._current_frames().items():
+                if ident not in targets:
+                    continue
+                leaf = frame.f_code
+                if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+                    continue
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """1リクエスト分のプロファイラ。start() / stop() で囲み、save() で保存する。"""
+
+    def __init__(self, mode: str = MODE):
+        self.mode = mode
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self) -> None:
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), INTERVAL)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+            if self._sampler is not None:
+                self._sampler.stop()
+        finally:
+            _active.release()
+
+    def save(self, method: str, path: str) -> str:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stem = (f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}-{method}-"
+                f"{_UNSAFE.sub('_', path.strip('/'))}")
+        if self._profile is not None:
+            target = PROFILE_DIR / f"{stem}.prof"
+            self._profile.dump_stats(target)
+        else:
+            target = PROFILE_DIR / f"{stem}.collapsed"
+            target.write_text(self._sampler.collapsed(), encoding="utf-8")
+        return target.name
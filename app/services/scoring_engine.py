@@ -0,0 +1,95 @@
+"""架電優先スコアの計算ロジック。
+
+スコア式: (total_purchase / purchase_divisor) + recency_weight / days_since_last_call
+係数と架電履歴なしのときの経過日数は環境変数から読み込む。
+全顧客を一括で計算する場合は score_batch で NumPy 配列のまま計算し、
+DB 側で計算する場合は days_since_expression / score_expression を使う。
+どちらも小数第2位で四捨五入（0.5 は切り上げ）する。DB の ROUND は MySQL と SQLite で
+端数の扱いが異なり NumPy の np.round（偶数丸め）とも一致しないため、floor(x * 100 + 0.5) / 100 で揃える。
+"""
+import os
+from datetime import date
+from typing import NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import Float, case, func, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class ScoreWeights(NamedTuple):
+    purchase_divisor: float = 1000.0
+    recency_weight: float = 100.0
+    default_days: int = 365
+
+    @classmethod
+    def from_env(cls) -> "ScoreWeights":
+        return cls(
+            purchase_divisor=float(os.getenv("SCORE_PURCHASE_DIVISOR", "1000")),
+            recency_weight=float(os.getenv("SCORE_RECENCY_WEIGHT", "100")),
+            default_days=int(os.getenv("SCORE_DEFAULT_DAYS", "365")),
+        )
+
+
+WEIGHTS = ScoreWeights.from_env()
+
+
+class floor_(FunctionElement):
+    """小数点以下の切り捨て。SQLite は FLOOR を持たないビルドがあるため CAST で求める。"""
+
+    type = Float()
+    inherit_cache = True
+    name = "floor"
+
+
+@compiles(floor_)
+def _floor_default(element, compiler, **kw):
+    return "FLOOR(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(floor_, "sqlite")
+def _floor_sqlite(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    return "(CAST(%s AS INTEGER) - (CAST(%s AS INTEGER) > %s))" % (value, value, value)
+
+
+def round_scores(scores):
+    """スコアの配列を小数第2位で四捨五入する（score_expression と同じ規則）。"""
+    return np.floor(scores * 100 + 0.5) / 100
+
+
+def score_batch(total_purchase, latest_call_date, today: Optional[date] = None,
+                weights: ScoreWeights = WEIGHTS):
+    """列データをまとめてスコア化し (days_since_last_call, score) の配列を返す。
+
+    total_purchase は数値の配列（欠損は 0 扱い）、latest_call_date は日付の配列
+    （None / NaT は架電履歴なし）。pandas の Series もそのまま渡せる。
+    """
+    today = np.datetime64(today or date.today(), "D")
+    purchases = np.nan_to_num(np.asarray(total_purchase, dtype="float64"))
+    latest = np.asarray(latest_call_date, dtype="datetime64[D]")
+
+    no_call = np.isnat(latest)
+    elapsed = (today - np.where(no_call, today, latest)).astype("int64")
+    days = np.where(no_call, weights.default_days, np.maximum(elapsed, 1))
+
+    scores = round_scores(purchases / weights.purchase_divisor + weights.recency_weight / days)
+    return days, scores
+
+
+def days_since_expression(latest_call_date, elapsed, weights: ScoreWeights = WEIGHTS):
+    """DB 側で days_since_last_call を求める式。elapsed は今日までの日数の式。"""
+    return case(
+        (latest_call_date.is_(None), weights.default_days),
+        (elapsed < 1, 1),
+        else_=elapsed,
+    )
+
+
+def score_expression(total_purchase, days_since_last_call, weights: ScoreWeights = WEIGHTS):
+    """DB 側でスコアを求める式。"""
+    score = (
+        func.coalesce(total_purchase, 0) / literal(weights.purchase_divisor, Float())
+        + literal(weights.recency_weight, Float()) / days_since_last_call
+    )
+    return floor_(score * 100 + 0.5) / literal(100.0, Float())
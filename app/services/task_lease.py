@@ -0,0 +1,51 @@
+"""task_lease テーブルによるリース。複数ワーカーのうち1つだけに実行させる処理で使う。
+
+acquire() で取れた（または延長できた）ワーカーだけが処理を行い、終わったら release() で手放す。
+持っているワーカーが止まっても期限が切れれば他のワーカーが取れる。
+同期の Session を受け取る。非同期の処理からは AsyncSession.run_sync(acquire, ...) で呼ぶ。
+"""
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.task_lease import TaskLease
+
+
+def owner() -> str:
+    """このワーカーの識別子。fork 後のワーカーで別になるよう呼ぶたびに pid を読む。"""
+    return f"{socket.gethostname()}:{os.getpid()}"[-64:]
+
+
+def acquire(db: Session, name: str, ttl: float) -> bool:
+    """リースを取るか延長する。他のワーカーが期限内で持っていれば False。"""
+    me = owner()
+    now = datetime.now()
+    values = {"owner": me, "expires_at": now + timedelta(seconds=ttl)}
+    result = db.execute(
+        update(TaskLease)
+        .where(TaskLease.name == name, or_(TaskLease.owner == me, TaskLease.expires_at <= now))
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        # 行がなければ作る。他のワーカーが持っていれば何もしない
+        db.execute(
+            insert(TaskLease.__table__)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .values(name=name, **values)
+        )
+    db.commit()
+    return db.scalar(select(TaskLease.owner).where(TaskLease.name == name)) == me
+
+
+def release(db: Session, name: str) -> None:
+    """持っているリースを期限切れにし、他のワーカーがすぐに取れるようにする。"""
+    db.execute(
+        update(TaskLease)
+        .where(TaskLease.name == name, TaskLease.owner == owner())
+        .values(expires_at=datetime.now())
+    )
+    db.commit()
@@ -0,0 +1,7 @@
+"""FastAPI アプリのホットパスのベンチマーク。
+
+python -m benchmarks run --sizes 1k,100k,1m --output results.json --baseline baseline.json
+のように実行する。件数ごとに SQLite にダミーデータを投入し（data_import.seed を使い、
+benchmarks/.data にキャッシュする）、別プロセスでルーター関数を直接呼んで計測する。
+python -m benchmarks load は uvicorn を起動して HTTP で同時アクセスを再現する（load.py）。
+"""
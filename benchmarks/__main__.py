@@ -0,0 +1,118 @@
+"""python -m benchmarks [run|compare|load] ...
+
+  run      件数ごとに計測して結果を表示する（--output で JSON に保存、--baseline で比較）
+  compare  保存済みの結果 JSON 2つを比較する（回帰があれば終了コード 1）
+  load     サーバーを起動してオペレーターの同時アクセスを再現する
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from benchmarks.compare import compare, format_results
+from benchmarks.load import DEFAULT_MIX, format_load, load, parse_mix
+from benchmarks.runner import CASE_NAMES, DEFAULT_DATA_DIR, parse_sizes, run, worker
+
+
+def _load(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _report_regressions(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> int:
+    regressions = compare(results, baseline, threshold, min_delta_ms)
+    for r in regressions:
+        print(f"[回帰] {r.size}件 {r.case} {r.metric}: {r.baseline} -> {r.current} ({r.change:+.1%})")
+    if not regressions:
+        print(f"回帰はありません（しきい値 {threshold:.0%}）。")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="計測する")
+    run_parser.add_argument("--sizes", default="1k,100k,1m", help="顧客数（例: 1k,100k,1m）")
+    run_parser.add_argument("--iterations", type=int, default=200, help="API 系ケースの反復回数")
+    run_parser.add_argument("--import-iterations", type=int, default=5, help="CSV 取込の反復回数")
+    run_parser.add_argument("--csv-rows", type=int, default=5000, help="CSV 取込1回あたりの行数")
+    run_parser.add_argument("--cases", default=",".join(CASE_NAMES), help="計測するケース（カンマ区切り）")
+    run_parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="投入済み DB の置き場所")
+    run_parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    run_parser.add_argument("--baseline", help="比較するベースラインの JSON ファイル")
+    run_parser.add_argument("--threshold", type=float, default=0.2, help="回帰とみなす悪化の割合")
+    run_parser.add_argument("--min-delta-ms", type=float, default=1.0, help="回帰とみなす最小の悪化幅（ms）")
+
+    compare_parser = commands.add_parser("compare", help="結果 JSON をベースラインと比較する")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+
+    load_parser = commands.add_parser("load", help="HTTP で負荷をかける")
+    load_parser.add_argument("--operators", type=int, default=200, help="同時に操作するオペレーター数")
+    load_parser.add_argument("--duration", type=float, default=60, help="負荷をかける秒数（立ち上げ後）")
+    load_parser.add_argument("--ramp-up", type=float, default=5, help="全員がそろうまでの秒数")
+    load_parser.add_argument("--mix", default=DEFAULT_MIX, help="操作の重み（priority/detail/call）")
+    load_parser.add_argument("--think-time", type=float, default=0, help="操作間の平均待ち時間（秒）")
+    load_parser.add_argument("--size", default="100k", help="起動するサーバーに投入する顧客数")
+    load_parser.add_argument("--workers", type=int, default=1, help="uvicorn のワーカー数")
+    load_parser.add_argument("--database-url", help="既存の DB（ローカルの MySQL など）を使う場合の接続先")
+    load_parser.add_argument("--url", help="起動済みのサーバーに負荷をかける場合の URL")
+    load_parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="投入済み DB の置き場所")
+    load_parser.add_argument("--output", help="結果を保存する JSON ファイル")
+
+    worker_parser = commands.add_parser("worker", help=argparse.SUPPRESS)
+    worker_parser.add_argument("--output", required=True)
+    worker_parser.add_argument("--iterations", type=int, required=True)
+    worker_parser.add_argument("--import-iterations", type=int, required=True)
+    worker_parser.add_argument("--csv-rows", type=int, required=True)
+    worker_parser.add_argument("--cases", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        worker(Path(args.output), args.iterations, args.import_iterations, args.csv_rows,
+               args.cases.split(","))
+        return 0
+
+    if args.command == "load":
+        try:
+            mix = parse_mix(args.mix)
+        except ValueError as e:
+            parser.error(str(e))
+        result = load(
+            args.url, args.database_url, parse_sizes(args.size)[0], args.workers, Path(args.data_dir),
+            operators=args.operators, duration=args.duration, mix=mix,
+            think_time=args.think_time, ramp_up=args.ramp_up,
+        )
+        print(format_load(result))
+        if args.output:
+            Path(args.output).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"結果を保存しました: {args.output}")
+        return 0
+
+    if args.command == "compare":
+        results, baseline = _load(args.results), _load(args.baseline)
+        print(format_results(results, baseline))
+        return _report_regressions(results, baseline, args.threshold, args.min_delta_ms)
+
+    cases = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = set(cases) - set(CASE_NAMES)
+    if unknown:
+        parser.error(f"未知のケースです: {', '.join(sorted(unknown))}")
+    results = run(parse_sizes(args.sizes), Path(args.data_dir), args.iterations,
+                  args.import_iterations, args.csv_rows, cases)
+    baseline = _load(args.baseline) if args.baseline else None
+    print(format_results(results, baseline))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"結果を保存しました: {args.output}")
+    if baseline:
+        return _report_regressions(results, baseline, args.threshold, args.min_delta_ms)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""計測対象のケース。
+
+ワーカープロセスで DATABASE_URL を設定してから import すること（app.database が
+import 時にエンジンを作るため）。各ケースは (ctx, i) を受け取って計測外の準備を済ませ、
+db を受け取って処理件数を返す関数を返す。async のエンドポイントは async 関数を返し、
+AsyncSession で同じイベントループ上で実行する。計測はリクエストと同じくセッションの作成から
+クローズまでを含む。
+"""
+import asyncio
+import inspect
+import io
+import random
+import time
+import tracemalloc
+from datetime import date
+from typing import Callable, Dict, List
+
+from fastapi import UploadFile
+from sqlalchemy import func, select
+from starlette.requests import Request
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.customer import Customer
+from app.routers.customer import HISTORY_LIMIT, get_customer_detail, get_customers
+from app.routers.import_data import add_call_record, import_card, import_csv_file
+from app.routers.scoring import get_priority_list
+from app.services import priority_cache
+from benchmarks.stats import percentile
+
+PAGE_SIZE = 100
+BATCH_CUSTOMERS = 50
+NAME_SAMPLE_SIZE = 1000
+
+
+class Context:
+    """ケース間で共有する乱数と、計測前に読んでおく顧客の情報。"""
+
+    def __init__(self, random_seed: int = 42, csv_rows: int = 5000):
+        self.rng = random.Random(random_seed)
+        # 非同期エンジンのコネクションはループに紐づくため、全ケースで1つのループを使う
+        self.loop = asyncio.new_event_loop()
+        self.csv_rows = csv_rows
+        db = SessionLocal()
+        try:
+            self.max_customer_id = db.execute(select(func.max(Customer.customer_id))).scalar() or 0
+            sample = self.rng.sample(range(1, self.max_customer_id + 1),
+                                     min(NAME_SAMPLE_SIZE, self.max_customer_id))
+            self.company_names = db.execute(
+                select(Customer.company_name).where(Customer.customer_id.in_(sample))
+            ).scalars().all()
+        finally:
+            db.close()
+
+    @property
+    def page_rows(self) -> int:
+        return min(PAGE_SIZE, self.max_customer_id)
+
+    def customer_id(self) -> int:
+        return self.rng.randint(1, self.max_customer_id)
+
+
+def _request(path: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""})
+
+
+def priority_list(ctx: Context, i: int):
+    # キャッシュを外して customer_priority を読む経路を計測する
+    priority_cache.invalidate()
+
+    async def run(db) -> int:
+        await get_priority_list(_request("/api/priority-list"), limit=PAGE_SIZE,
+                                after_score=None, after_id=None, q=None, db=db)
+        return ctx.page_rows
+    return run
+
+
+def priority_list_cached(ctx: Context, i: int):
+    async def run(db) -> int:
+        await get_priority_list(_request("/api/priority-list"), limit=PAGE_SIZE,
+                                after_score=None, after_id=None, q=None, db=db)
+        return ctx.page_rows
+    return run
+
+
+def customer_detail(ctx: Context, i: int):
+    customer_id = ctx.customer_id()
+
+    async def run(db) -> int:
+        detail = await get_customer_detail(customer_id, history_limit=HISTORY_LIMIT, history_cursor=None, db=db)
+        return 1 + len(detail.call_history)
+    return run
+
+
+def customers_batch(ctx: Context, i: int):
+    # 管理者が一覧の顧客をまとめて確認する想定
+    ids = ",".join(str(ctx.customer_id()) for _ in range(BATCH_CUSTOMERS))
+
+    async def run(db) -> int:
+        details = await get_customers([ids], history_limit=HISTORY_LIMIT, db=db)
+        return sum(1 + len(detail.call_history) for detail in details)
+    return run
+
+
+def csv_import(ctx: Context, i: int):
+    lines = ["customer_name,company_name,contact_number,total_purchase,last_purchase_date"]
+    for j in range(ctx.csv_rows):
+        lines.append(f"ベンチ 太郎{j},ベンチ取込{i:04d}商事{j:06d},03-0000-{j % 10000:04d},"
+                     f"{ctx.rng.randint(1, 5000) * 10000},2026-01-{j % 28 + 1:02d}")
+    payload = "\n".join(lines).encode("utf-8")
+
+    def run(db) -> int:
+        upload = UploadFile(io.BytesIO(payload), filename="bench.csv")
+        return import_csv_file(file=upload, db=db)["imported"]
+    return run
+
+
+def card_import(ctx: Context, i: int):
+    # 完全一致・表記ゆれ（先頭1文字違い）・新規の会社を順に混ぜる
+    name = ctx.rng.choice(ctx.company_names)
+    if i % 3 == 1:
+        name = "ー" + name[1:]
+    elif i % 3 == 2:
+        name = f"ベンチ名刺{i:06d}工房"
+
+    async def run(db) -> int:
+        await import_card(company_name=name, personal_name="ベンチ 花子", contact_number="",
+                          email="", address="", db=db)
+        return 1
+    return run
+
+
+def call_record(ctx: Context, i: int):
+    customer_id = ctx.customer_id()
+    today = date.today().isoformat()
+
+    async def run(db) -> int:
+        await add_call_record(customer_id=customer_id, call_date=today, call_result="ベンチ",
+                              call_duration="01:00", db=db)
+        return 1
+    return run
+
+
+# ケース名 -> (準備関数, 反復回数の種別)。"import" は --import-iterations 回だけ実行する
+CASES: Dict[str, tuple] = {
+    "get_priority_list": (priority_list, "request"),
+    "get_priority_list_cached": (priority_list_cached, "request"),
+    "get_customer_detail": (customer_detail, "request"),
+    "get_customers": (customers_batch, "request"),
+    "import_csv_file": (csv_import, "import"),
+    "import_card": (card_import, "request"),
+    "add_call_record": (call_record, "request"),
+}
+
+
+async def _in_async_session(run: Callable) -> int:
+    async with AsyncSessionLocal() as db:
+        return await run(db)
+
+
+def _timed(ctx: Context, run: Callable) -> tuple:
+    start = time.perf_counter()
+    if inspect.iscoroutinefunction(run):
+        rows = ctx.loop.run_until_complete(_in_async_session(run))
+    else:
+        db = SessionLocal()
+        try:
+            rows = run(db)
+        finally:
+            db.close()
+    return time.perf_counter() - start, rows
+
+
+def measure(ctx: Context, prepare: Callable, iterations: int) -> Dict:
+    """1回目は tracemalloc 付きで実行してピークメモリを測り（ウォームアップを兼ねる）、
+    続く iterations 回の所要時間を集計する。
+    """
+    tracemalloc.start()
+    try:
+        _timed(ctx, prepare(ctx, 0))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples: List[float] = []
+    total_rows = 0
+    for i in range(1, iterations + 1):
+        seconds, rows = _timed(ctx, prepare(ctx, i))
+        samples.append(seconds)
+        total_rows += rows
+    return summarize(samples, total_rows, peak)
+
+
+def summarize(samples: List[float], total_rows: int, peak_memory: int) -> Dict:
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(total / len(ordered) * 1000, 3) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "rows_per_sec": round(total_rows / total, 1) if total else 0.0,
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
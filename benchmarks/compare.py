@@ -0,0 +1,65 @@
+"""保存済みのベースラインとの比較。
+
+p50 / p95 が threshold の割合を超えて遅くなった、または rows/sec が同じ割合を超えて
+下がったケースを回帰とみなす。1ms 未満の揺れで誤検知しないよう、レイテンシは
+min_delta_ms 以上悪化した場合だけ数える。
+"""
+from typing import Dict, List, NamedTuple
+
+LATENCY_KEYS = ("p50_ms", "p95_ms")
+
+
+class Regression(NamedTuple):
+    size: str
+    case: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return (self.current - self.baseline) / self.baseline if self.baseline else 0.0
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2,
+            min_delta_ms: float = 1.0) -> List[Regression]:
+    regressions = []
+    for size, result in current["sizes"].items():
+        base_result = baseline.get("sizes", {}).get(size)
+        if not base_result:
+            continue
+        for case, stats in result["cases"].items():
+            base = base_result["cases"].get(case)
+            if not base:
+                continue
+            for key in LATENCY_KEYS:
+                if (stats[key] > base[key] * (1 + threshold)
+                        and stats[key] - base[key] >= min_delta_ms):
+                    regressions.append(Regression(size, case, key, base[key], stats[key]))
+            if stats["rows_per_sec"] < base["rows_per_sec"] * (1 - threshold):
+                regressions.append(
+                    Regression(size, case, "rows_per_sec", base["rows_per_sec"], stats["rows_per_sec"])
+                )
+    return regressions
+
+
+def format_results(results: Dict, baseline: Dict = None) -> str:
+    """結果を表形式の文字列にする。baseline があれば p50 の増減も並べる。"""
+    lines = []
+    header = f"{'customers':>9} {'case':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>11} {'peak KB':>9}"
+    if baseline:
+        header += f" {'p50 vs base':>11}"
+    lines.append(header)
+    for size, result in results["sizes"].items():
+        base_cases = (baseline or {}).get("sizes", {}).get(size, {}).get("cases", {})
+        for case, stats in result["cases"].items():
+            line = (
+                f"{size:>9} {case:<26} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                f"{stats['p99_ms']:>9.2f} {stats['rows_per_sec']:>11.1f} {stats['peak_memory_kb']:>9.1f}"
+            )
+            if baseline:
+                base = base_cases.get(case)
+                line += f" {(stats['p50_ms'] / base['p50_ms'] - 1) * 100:>+10.1f}%" if base and base["p50_ms"] else f" {'-':>11}"
+            lines.append(line)
+        lines.append(f"{size:>9} {'(max RSS)':<26} {result['max_rss_kb']:>9} KB")
+    return "\n".join(lines)
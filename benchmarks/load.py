@@ -0,0 +1,313 @@
+"""オペレーターの同時アクセスを再現する負荷試験。
+
+python -m benchmarks load --operators 200 --duration 60 --mix priority=2,detail=6,call=2
+のように実行する。--url を省略すると、シード済みの SQLite（benchmarks.runner と同じ
+キャッシュ）を作業用にコピーして uvicorn を別プロセスで起動する。ローカルの MySQL を
+使う場合は --database-url を渡す（データは投入済みであること）。
+
+オペレーター1人を1スレッドで表し、ブラウザと同じく keep-alive の接続を使い回す。
+顧客詳細ページは customer_detail.html と同じく /api/customer/{id} と
+/api/script-hint を並列に取得する（2本目の接続を使う）。
+依存を増やさないよう HTTP クライアントは標準ライブラリの http.client を使う。
+"""
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.runner import DEFAULT_DATA_DIR, ROOT, copy_sqlite, ensure_seeded, remove_sqlite
+from benchmarks.stats import percentile
+
+ACTIONS = ("priority", "detail", "call")
+DEFAULT_MIX = "priority=2,detail=6,call=2"
+PAGE_SIZE = 100
+REQUEST_TIMEOUT = 30.0
+SERVER_START_TIMEOUT = 120.0
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"priority=2,detail=6,call=2" のような重みの指定を辞書にする。"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"未知の操作です: {name}（{', '.join(ACTIONS)} のいずれか）")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("操作の重みがすべて 0 です")
+    return mix
+
+
+class Recorder:
+    """ルートごとの所要時間とエラーをスレッド間で集める。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_examples: Dict[str, str] = {}
+
+    def record(self, route: str, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.samples[route].append(seconds)
+            if error:
+                self.errors[route] += 1
+                self.error_examples.setdefault(route, error)
+
+
+class Client:
+    """1本の keep-alive 接続。切断されたら次のリクエストで張り直す。"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, headers: Optional[dict] = None):
+        reused = self.conn is not None
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            self.close()
+            # keep-alive のタイムアウトでサーバーが閉じた接続だった場合は、ブラウザと同じく張り直して1回だけ再送する
+            if not reused:
+                raise
+            return self.request(method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Operator(threading.Thread):
+    """一覧を開き、一覧の顧客の詳細を見て、架電結果を登録する1人のオペレーター。"""
+
+    def __init__(self, index: int, host: str, port: int, mix: Dict[str, float], recorder: Recorder,
+                 deadline: float, think_time: float, random_seed: int):
+        super().__init__(name=f"operator-{index}", daemon=True)
+        self.rng = random.Random(random_seed + index)
+        self.main = Client(host, port)
+        self.side = Client(host, port)
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.recorder = recorder
+        self.deadline = deadline
+        self.think_time = think_time
+        self.customer_ids: List[int] = []
+        self.today = date.today().isoformat()
+
+    def _call(self, client: Client, route: str, method: str, path: str,
+              body: Optional[bytes] = None, headers: Optional[dict] = None) -> Optional[bytes]:
+        start = time.perf_counter()
+        try:
+            status, data = client.request(method, path, body, headers)
+        except Exception as e:
+            self.recorder.record(route, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            return None
+        error = f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}" if status >= 400 else None
+        self.recorder.record(route, time.perf_counter() - start, error)
+        return None if error else data
+
+    def priority_list(self) -> None:
+        data = self._call(self.main, "GET /api/priority-list", "GET", f"/api/priority-list?limit={PAGE_SIZE}")
+        if data:
+            self.customer_ids = [row["customer_id"] for row in json.loads(data)] or self.customer_ids
+
+    def detail(self, executor: ThreadPoolExecutor) -> None:
+        customer_id = self.rng.choice(self.customer_ids)
+        start = time.perf_counter()
+        hint = executor.submit(self._call, self.side, "GET /api/script-hint", "GET",
+                               f"/api/script-hint?customer_id={customer_id}")
+        customer = self._call(self.main, "GET /api/customer/{customer_id}", "GET", f"/api/customer/{customer_id}")
+        hint_data = hint.result()
+        # 2本そろって画面が表示されるまでの時間
+        failed = None if customer and hint_data else "どちらかの取得に失敗"
+        self.recorder.record("page: customer detail", time.perf_counter() - start, failed)
+
+    def call(self) -> None:
+        body = urlencode({
+            "customer_id": self.rng.choice(self.customer_ids),
+            "call_date": self.today,
+            "call_result": self.rng.choice(("不在", "検討中", "折り返し希望", "商談確定")),
+            "call_duration": f"{self.rng.randint(0, 30):02d}:{self.rng.randint(0, 59):02d}",
+        }).encode("ascii")
+        self._call(self.main, "POST /api/call-record", "POST", "/api/call-record", body,
+                   {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def run(self) -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while time.monotonic() < self.deadline:
+                    action = self.rng.choices(self.actions, self.weights)[0]
+                    # まだ一覧を取れていなければ、詳細や架電登録の前に一覧を開く
+                    if action == "priority" or not self.customer_ids:
+                        self.priority_list()
+                    elif action == "detail":
+                        self.detail(executor)
+                    else:
+                        self.call()
+                    if self.think_time:
+                        time.sleep(self.rng.uniform(0, 2 * self.think_time))
+            finally:
+                self.main.close()
+                self.side.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(host: str, port: int, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    client = Client(host, port)
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"サーバーが起動できませんでした（終了コード {process.returncode}）")
+        try:
+            status, _ = client.request("GET", "/api/priority-list?limit=1")
+            if status == 200:
+                client.close()
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("サーバーの起動待ちがタイムアウトしました")
+
+
+def start_server(database_url: str, workers: int = 1) -> tuple:
+    """uvicorn を別プロセスで起動して (process, host, port) を返す。"""
+    host, port = "127.0.0.1", _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", host, "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=ROOT,
+        env=dict(os.environ, DATABASE_URL=database_url),
+    )
+    try:
+        _wait_until_ready(host, port, process)
+    except Exception:
+        process.terminate()
+        process.wait()
+        raise
+    return process, host, port
+
+
+def run_load(host: str, port: int, operators: int = 200, duration: float = 60.0,
+             mix: Dict[str, float] = None, think_time: float = 0.0, ramp_up: float = 5.0,
+             random_seed: int = 42) -> Dict:
+    """operators 人分のスレッドを ramp_up 秒かけて起動し、duration 秒間負荷をかける。"""
+    mix = mix or parse_mix(DEFAULT_MIX)
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + ramp_up + duration
+    threads = []
+    for i in range(operators):
+        thread = Operator(i, host, port, mix, recorder, deadline, think_time, random_seed)
+        thread.start()
+        threads.append(thread)
+        if ramp_up:
+            time.sleep(ramp_up / operators)
+    for thread in threads:
+        thread.join()
+    return summarize(recorder, time.monotonic() - started, operators, mix)
+
+
+def summarize(recorder: Recorder, elapsed: float, operators: int, mix: Dict[str, float]) -> Dict:
+    routes = {}
+    total = errors = 0
+    for route, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        route_errors = recorder.errors.get(route, 0)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": route_errors,
+            "error_rate": round(route_errors / len(ordered), 4),
+            "throughput_rps": round(len(ordered) / elapsed, 1),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+        if route in recorder.error_examples:
+            routes[route]["first_error"] = recorder.error_examples[route]
+        # ページ単位の集計は HTTP リクエスト数に含めない
+        if not route.startswith("page:"):
+            total += len(ordered)
+            errors += route_errors
+    return {
+        "operators": operators,
+        "mix": mix,
+        "seconds": round(elapsed, 1),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "routes": routes,
+    }
+
+
+def format_load(result: Dict) -> str:
+    lines = [
+        f"オペレーター {result['operators']}人 / {result['seconds']}秒 / "
+        f"{result['requests']}リクエスト / {result['throughput_rps']} req/s / エラー率 {result['error_rate']:.2%}",
+        f"{'route':<34} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}",
+    ]
+    for route, stats in result["routes"].items():
+        lines.append(
+            f"{route:<34} {stats['requests']:>9} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>8}"
+        )
+    for route, stats in result["routes"].items():
+        if "first_error" in stats:
+            lines.append(f"  {route} の最初のエラー: {stats['first_error']}")
+    return "\n".join(lines)
+
+
+def load(url: Optional[str], database_url: Optional[str], size: int, workers: int, data_dir: Path = DEFAULT_DATA_DIR,
+         **options) -> Dict:
+    """--url があればそのサーバーに、なければサーバーを起動してから負荷をかける。"""
+    if url:
+        parts = urlsplit(url)
+        result = run_load(parts.hostname, parts.port or 80, **options)
+        result["target"] = url
+        return result
+
+    work_path = None
+    if not database_url:
+        work_path = data_dir / f"load_{size}.db"
+        copy_sqlite(ensure_seeded(size, data_dir), work_path)
+        database_url = f"sqlite:///{work_path}"
+    process, host, port = start_server(database_url, workers)
+    try:
+        result = run_load(host, port, **options)
+    finally:
+        process.terminate()
+        process.wait()
+        if work_path:
+            remove_sqlite(work_path)
+    result["target"] = f"{database_url.split('://')[0]} ({size if work_path else 'external'}), uvicorn workers={workers}"
+    return result
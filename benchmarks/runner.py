@@ -0,0 +1,148 @@
+"""件数ごとのデータ投入とワーカープロセスの起動。
+
+投入済みの SQLite は data_dir/seed_<件数>_<乱数シード>.db にキャッシュし、計測のたびに作業用ファイルへ
+コピーしてから使う（書き込み系のケースで元データが変わらないように）。
+件数ごとに別プロセスで計測するので、ピークメモリ（max_rss_kb）も件数ごとの値になる。
+"""
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent / ".data"
+_SIZE_PATTERN = re.compile(r"^(\d+)([km]?)$")
+# benchmarks.cases.CASES のキー。cases は app.database を import するので親プロセスでは読まない
+CASE_NAMES = (
+    "get_priority_list",
+    "get_priority_list_cached",
+    "get_customer_detail",
+    "get_customers",
+    "import_csv_file",
+    "import_card",
+    "add_call_record",
+)
+
+
+def parse_sizes(text: str) -> List[int]:
+    """"1k,100k,1m" のような指定を件数のリストにする。"""
+    sizes = []
+    for item in text.split(","):
+        match = _SIZE_PATTERN.match(item.strip().lower())
+        if not match:
+            raise ValueError(f"件数の指定が不正です: {item}")
+        sizes.append(int(match.group(1)) * {"": 1, "k": 1000, "m": 1000000}[match.group(2)])
+    return sizes
+
+
+def _sqlite_url(path: Path) -> str:
+    return f"sqlite:///{path}"
+
+
+def remove_sqlite(path: Path) -> None:
+    """SQLite ファイルを WAL / 共有メモリのファイルごと消す。"""
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def copy_sqlite(source: Path, target: Path) -> None:
+    # 前回の作業用ファイルの WAL が残っていると、コピーした DB に適用されて壊れる
+    remove_sqlite(target)
+    shutil.copyfile(source, target)
+
+
+def ensure_seeded(size: int, data_dir: Path, random_seed: int = 42) -> Path:
+    """size 件のダミーデータを投入した SQLite を用意して返す（あれば使い回す）。"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"seed_{size}_{random_seed}.db"
+    if path.exists():
+        return path
+    # 途中で止めたファイルを使い回さないように、完了してから名前を変える
+    partial = path.with_suffix(".partial")
+    remove_sqlite(partial)
+    print(f"[{size}] ダミーデータを投入しています...", flush=True)
+    subprocess.run(
+        [sys.executable, "-m", "data_import.seed", "--customers", str(size), "--seed", str(random_seed)],
+        cwd=ROOT,
+        env=dict(os.environ, DATABASE_URL=_sqlite_url(partial)),
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    partial.rename(path)
+    return path
+
+
+def run_size(size: int, data_dir: Path, iterations: int, import_iterations: int,
+             csv_rows: int, cases: List[str]) -> Dict:
+    seed_path = ensure_seeded(size, data_dir)
+    work_path = data_dir / f"work_{size}.db"
+    copy_sqlite(seed_path, work_path)
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        output = Path(out.name)
+    try:
+        print(f"[{size}] 計測しています...", flush=True)
+        subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks", "worker",
+                "--output", str(output),
+                "--iterations", str(iterations),
+                "--import-iterations", str(import_iterations),
+                "--csv-rows", str(csv_rows),
+                "--cases", ",".join(cases),
+            ],
+            cwd=ROOT,
+            env=dict(os.environ, DATABASE_URL=_sqlite_url(work_path)),
+            check=True,
+        )
+        result = json.loads(output.read_text(encoding="utf-8"))
+    finally:
+        output.unlink(missing_ok=True)
+        remove_sqlite(work_path)
+    result["customers"] = size
+    return result
+
+
+def run(sizes: List[int], data_dir: Path = DEFAULT_DATA_DIR, iterations: int = 200,
+        import_iterations: int = 5, csv_rows: int = 5000, cases: List[str] = None) -> Dict:
+    cases = cases or list(CASE_NAMES)
+    started = time.perf_counter()
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "import_iterations": import_iterations,
+        "csv_rows": csv_rows,
+        "sizes": {},
+    }
+    for size in sizes:
+        results["sizes"][str(size)] = run_size(size, data_dir, iterations, import_iterations, csv_rows, cases)
+    results["seconds"] = round(time.perf_counter() - started, 1)
+    return results
+
+
+def worker(output: Path, iterations: int, import_iterations: int, csv_rows: int, cases: List[str]) -> None:
+    """ワーカープロセス側。DATABASE_URL の指す DB で各ケースを計測して output に書く。"""
+    import resource
+
+    from benchmarks.cases import CASES, Context, measure
+
+    ctx = Context(csv_rows=csv_rows)
+    measured = {}
+    for name in cases:
+        prepare, kind = CASES[name]
+        measured[name] = measure(ctx, prepare, import_iterations if kind == "import" else iterations)
+    result = {
+        "cases": measured,
+        # Linux の ru_maxrss は KB 単位
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
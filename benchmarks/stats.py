@@ -0,0 +1,12 @@
+"""集計用の小さな関数（app を import しないので親プロセスからも使える）。"""
+from typing import List
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """線形補間のパーセンタイル（q は 0〜100）。"""
+    if not sorted_samples:
+        return 0.0
+    position = (len(sorted_samples) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
@@ -0,0 +1,91 @@
+"""電話システム（PBX）からエクスポートした架電ログ CSV の一括取込。
+
+必須カラム: customer_id, call_date（任意: call_result, call_duration）
+python -m data_import.import_calls calls.csv でも実行できる。
+"""
+import os
+import sys
+from typing import BinaryIO, Dict, Set
+
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.models.call_record import CallRecord
+from app.models.customer import Customer
+from app.services.customer_import import CHUNK_SIZE, LOOKUP_BATCH_SIZE, iter_csv_chunks
+from app.services.priority_service import update_latest_call_dates
+
+REQUIRED_CALL_COLUMNS = {"customer_id", "call_date"}
+
+
+def _existing_customer_ids(db: Session, customer_ids) -> Set[int]:
+    ids = list(customer_ids)
+    found = set()
+    for i in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        found.update(db.execute(
+            select(Customer.customer_id).where(Customer.customer_id.in_(ids[i:i + LOOKUP_BATCH_SIZE]))
+        ).scalars())
+    return found
+
+
+def _text(df: pd.DataFrame, column: str, max_length: int) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    values = df[column].astype(object).where(df[column].notna(), None)
+    return values.map(lambda v: str(v)[:max_length] if v is not None and str(v) != "" else None)
+
+
+def import_call_chunk(db: Session, df: pd.DataFrame) -> Dict[str, int]:
+    """1チャンク分の架電ログを登録する。コミットは呼び出し側で行う。
+
+    customer_id の存在確認は IN クエリでまとめて行い、日付は pandas で一括変換する。
+    最新架電日と優先度スコアの更新はチャンクごとに1回だけ行う。
+    """
+    customer_ids = pd.to_numeric(df["customer_id"], errors="coerce")
+    call_dates = pd.to_datetime(df["call_date"], errors="coerce")
+    valid = customer_ids.notna() & call_dates.notna()
+    invalid = int((~valid).sum())
+
+    df = pd.DataFrame({
+        "customer_id": customer_ids[valid].astype("int64"),
+        "call_date": call_dates[valid].dt.date,
+        "call_result": _text(df, "call_result", 255)[valid],
+        "call_duration": _text(df, "call_duration", 10)[valid],
+    })
+    known = _existing_customer_ids(db, df["customer_id"].unique().tolist())
+    known_mask = df["customer_id"].isin(known)
+    unknown = int((~known_mask).sum())
+    df = df[known_mask]
+
+    if len(df):
+        db.execute(insert(CallRecord.__table__), df.to_dict("records"))
+        latest = df.groupby("customer_id")["call_date"].max()
+        update_latest_call_dates(db, {int(cid): d for cid, d in latest.items()})
+
+    return {"imported": len(df), "invalid": invalid, "unknown_customer": unknown}
+
+
+def import_call_records(db: Session, fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    """架電ログ CSV を chunk_size 行ずつ取り込み、チャンクごとにコミットする。"""
+    totals = {"imported": 0, "invalid": 0, "unknown_customer": 0}
+    for chunk in iter_csv_chunks(fileobj, chunk_size, REQUIRED_CALL_COLUMNS):
+        counts = import_call_chunk(db, chunk)
+        db.commit()
+        for name, value in counts.items():
+            totals[name] += value
+    return totals
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        with open(sys.argv[1], "rb") as f:
+            result = import_call_records(session, f)
+        print(f"架電ログ取込完了: {result}")
+    finally:
+        session.close()
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from app.services.company_name import normalize_company_name
+
 
 def import_csv(file_path):
     df = pd.read_csv(file_path)
@@ -10,7 +12,8 @@ def import_csv(file_path):
         'total_purchase': 0.0
     }, inplace=True)
 
-    # 重複排除（company_name を基準）
-    df.drop_duplicates(subset='company_name', inplace=True)
+    # 重複排除（正規化した会社名を基準。「株式会社A」と「A(株)」は同じ会社とみなす）
+    df['company_key'] = df['company_name'].map(lambda name: normalize_company_name(str(name)))
+    df.drop_duplicates(subset='company_key', inplace=True)
 
     return df
@@ -1,9 +1,10 @@
 import pandas as pd
 
+from app.services.customer_import import iter_excel_chunks
 
-def import_excel(file_path):
-    df = pd.read_excel(file_path)
 
-    # 必要なカラムのみを抽出
-    necessary_columns = ['customer_name', 'company_name']
-    return df[necessary_columns]
+def import_excel(file_path):
+    """全シートを read-only モードで読み込み、顧客カラムを含む DataFrame を返す。
+    大きなブックはチャンク単位で処理できる iter_excel_chunks を直接使うこと。
+    """
+    return pd.concat(list(iter_excel_chunks(file_path)), ignore_index=True)
@@ -1,16 +1,29 @@
+"""デモ・負荷試験用のダミーデータ生成。
+
+アプリ起動時は seed() で顧客100件を投入する。本番相当の件数を再現したいときは
+python -m data_import.seed --customers 1000000 --calls-per-customer 1-5 --seed 42
+のように実行する。行は batch_size 件ずつ NumPy でまとめて生成し、Core の executemany で
+投入するため、同じ引数なら常に同じデータになる。
+"""
+import argparse
 import os
-import random
 import sys
-from datetime import date, timedelta
+import time
+from datetime import date
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.database import Base, SessionLocal, engine
-import app.models.customer  # noqa: F401
-import app.models.call_record  # noqa: F401
-import app.models.ocr_card  # noqa: F401
+import numpy as np
+from sqlalchemy import func
+
+from app.database import SessionLocal, engine
+from app.models import create_tables
 from app.models.customer import Customer
 from app.models.call_record import CallRecord
+from app.models.company_ngram import CompanyNgram
+from app.services.bulk_insert import executemany_insert
+from app.services.company_name import company_ngrams, normalize_company_name
+from app.services.priority_service import rebuild_priority
 
 SURNAMES = [
     "田中", "佐藤", "鈴木", "高橋", "伊藤", "渡辺", "山本", "中村", "小林", "加藤",
@@ -46,79 +59,201 @@ ADDRESSES = [
     "長野県長野市大字長野元善町481",
 ]
 CONTACT_METHODS = ["電話", "メール", "訪問", "オンライン"]
+AREA_CODES = ["03", "06", "052", "045", "092", "011", "022", "082", "075", "078"]
 CALL_RESULTS = [
     "折り返し希望", "商談確定", "資料送付済み", "不在",
     "興味なし", "検討中", "契約済み", "再コール希望", "担当者不在", "見積依頼",
 ]
 
+DEFAULT_BATCH_SIZE = 10000
+CUSTOMER_COLUMNS = (
+    "customer_id", "customer_name", "contact_number", "email", "address", "company_name",
+    "company_key", "last_purchase_date", "total_purchase", "last_contact_method", "latest_call_date",
+)
+CALL_COLUMNS = ("customer_id", "call_date", "call_duration", "call_result")
+NGRAM_COLUMNS = ("gram", "customer_id")
 
-def _random_date(start_days_ago: int, end_days_ago: int) -> date:
-    days_ago = random.randint(start_days_ago, end_days_ago)
-    return date.today() - timedelta(days=days_ago)
 
+def _pick(rng: np.random.Generator, values, size: int) -> list:
+    return [values[i] for i in rng.integers(0, len(values), size)]
 
-def _random_phone() -> str:
-    area = random.choice(["03", "06", "052", "045", "092", "011", "022", "082", "075", "078"])
-    return f"{area}-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}"
 
+def _company_base(customer_id: int) -> str:
+    n = customer_id - 1
+    return COMPANY_PREFIXES[n % len(COMPANY_PREFIXES)] + COMPANY_TYPES[n % len(COMPANY_TYPES)]
 
-def seed() -> None:
-    Base.metadata.create_all(bind=engine)
+
+def _iso_dates(today: np.datetime64, days_ago: np.ndarray) -> list:
+    return (today - days_ago.astype("timedelta64[D]")).astype(str).tolist()
+
+
+def _generate_batch(rng, start_id: int, size: int, width: int, min_calls: int, max_calls: int,
+                    today: np.datetime64):
+    """顧客 size 件とその架電履歴を CUSTOMER_COLUMNS / CALL_COLUMNS 順のタプルで返す。"""
+    ids = list(range(start_id, start_id + size))
+    surnames = _pick(rng, SURNAMES, size)
+    given_names = _pick(rng, GIVEN_NAMES, size)
+    addresses = _pick(rng, ADDRESSES, size)
+    methods = _pick(rng, CONTACT_METHODS, size)
+    areas = _pick(rng, AREA_CODES, size)
+    phone_numbers = rng.integers(1000, 10000, (size, 2)).tolist()
+    purchase_dates = _iso_dates(today, rng.integers(30, 731, size))
+    purchases = (np.round(rng.uniform(500_000, 50_000_000, size) / 1000) * 1000).tolist()
+
+    counts = rng.integers(min_calls, max_calls + 1, size)
+    total = int(counts.sum())
+    days_ago = rng.integers(1, 366, total)
+    minutes = rng.integers(1, 31, total).tolist()
+    seconds = rng.integers(0, 60, total).tolist()
+    results = _pick(rng, CALL_RESULTS, total)
+    call_customer_ids = np.repeat(ids, counts).tolist()
+
+    # 顧客ごとの最新架電日（経過日数の最小値）を非正規化列 latest_call_date に入れておく
+    latest_dates = [None] * size
+    has_calls = np.flatnonzero(counts)
+    if len(has_calls):
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[has_calls]
+        nearest = _iso_dates(today, np.minimum.reduceat(days_ago, starts))
+        for i, latest in zip(has_calls.tolist(), nearest):
+            latest_dates[i] = latest
+
+    # 会社名は「地名 + 業種 + 連番」なので、正規化は地名 + 業種の組み合わせごとに1回だけ行う
+    base_keys = {}
+    customers = []
+    for i, customer_id in enumerate(ids):
+        base = _company_base(customer_id)
+        if base not in base_keys:
+            base_keys[base] = normalize_company_name(base)
+        number = f"{customer_id:0{width}d}"
+        company_name = base + number
+        customers.append((
+            customer_id,
+            f"{surnames[i]} {given_names[i]}",
+            f"{areas[i]}-{phone_numbers[i][0]}-{phone_numbers[i][1]}",
+            f"user{customer_id}@{company_name}.co.jp",
+            addresses[i],
+            company_name,
+            base_keys[base] + number,
+            purchase_dates[i],
+            purchases[i],
+            methods[i],
+            latest_dates[i],
+        ))
+    calls = list(zip(
+        call_customer_ids,
+        _iso_dates(today, days_ago),
+        (f"{m:02d}:{sec:02d}" for m, sec in zip(minutes, seconds)),
+        results,
+    ))
+    return customers, calls
+
+
+def generate(customers: int = 100, min_calls: int = 1, max_calls: int = 5, random_seed: int = 42,
+             batch_size: int = DEFAULT_BATCH_SIZE, index_ngrams: bool = True) -> dict:
+    """顧客と架電履歴を batch_size 件ずつ生成して投入し、件数と所要時間を返す。
+
+    同じ引数なら同じデータになる。既存データがある場合は続きの customer_id から追加する。
+    最後に優先度スコアをまとめて再計算する（所要時間は scoring_seconds に分けて返す）。
+    """
+    rng = np.random.default_rng(random_seed)
+    today = np.datetime64(date.today(), "D")
+    width = max(3, len(str(customers)))
+
+    started = time.perf_counter()
+    inserted_customers = 0
+    inserted_calls = 0
+    inserted_ngrams = 0
     db = SessionLocal()
     try:
-        existing = db.query(Customer).count()
-        if existing > 0:
-            print(f"既にデータが存在します（{existing}件）。シードをスキップします。")
-            return
-
-        random.seed(42)
-
-        for i in range(100):
-            surname = random.choice(SURNAMES)
-            given_name = random.choice(GIVEN_NAMES)
-            prefix = COMPANY_PREFIXES[i % len(COMPANY_PREFIXES)]
-            ctype = COMPANY_TYPES[i % len(COMPANY_TYPES)]
-            # インデックスを付けて会社名の重複を防ぐ
-            company_name = f"{prefix}{ctype}{i + 1:03d}"
-
-            customer = Customer(
-                customer_name=f"{surname} {given_name}",
-                contact_number=_random_phone(),
-                email=f"user{i + 1}@{company_name.replace(' ', '')}.co.jp",
-                address=random.choice(ADDRESSES),
-                company_name=company_name,
-                last_purchase_date=_random_date(30, 730),
-                total_purchase=round(random.uniform(500_000, 50_000_000) / 1000) * 1000,
-                last_contact_method=random.choice(CONTACT_METHODS),
+        next_id = (db.query(func.max(Customer.customer_id)).scalar() or 0) + 1
+        for offset in range(0, customers, batch_size):
+            size = min(batch_size, customers - offset)
+            customer_rows, call_rows = _generate_batch(
+                rng, next_id + offset, size, width, min_calls, max_calls, today
             )
-            db.add(customer)
-            db.flush()  # customer_id を確定させる
-
-            # 架電履歴を 1〜5 件生成
-            num_calls = random.randint(1, 5)
-            call_dates = sorted(
-                [_random_date(1, 365) for _ in range(num_calls)],
-                reverse=True,
-            )
-            for call_date in call_dates:
-                minutes = random.randint(1, 30)
-                seconds = random.randint(0, 59)
-                call_record = CallRecord(
-                    customer_id=customer.customer_id,
-                    call_date=call_date,
-                    call_duration=f"{minutes:02d}:{seconds:02d}",
-                    call_result=random.choice(CALL_RESULTS),
-                )
-                db.add(call_record)
-
-        db.commit()
-        print("シード完了: 顧客100件 + 架電履歴を投入しました。")
+            executemany_insert(db, Customer.__table__, CUSTOMER_COLUMNS, customer_rows)
+            executemany_insert(db, CallRecord.__table__, CALL_COLUMNS, call_rows)
+            if index_ngrams:
+                # 生成した会社名は重複しないので INSERT IGNORE なしでそのまま登録できる
+                ngram_rows = [
+                    (gram, row[0]) for row in customer_rows for gram in company_ngrams(row[6])
+                ]
+                executemany_insert(db, CompanyNgram.__table__, NGRAM_COLUMNS, ngram_rows)
+                inserted_ngrams += len(ngram_rows)
+            db.commit()
+            inserted_customers += size
+            inserted_calls += len(call_rows)
+        inserted = time.perf_counter()
+        rebuild_priority(db)
     except Exception as e:
         db.rollback()
         raise e
     finally:
         db.close()
 
+    elapsed = inserted - started
+    rows = inserted_customers + inserted_calls + inserted_ngrams
+    return {
+        "customers": inserted_customers,
+        "call_records": inserted_calls,
+        "company_ngrams": inserted_ngrams,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed else rows,
+        "scoring_seconds": round(time.perf_counter() - inserted, 3),
+    }
+
+
+def seed() -> None:
+    """起動時のデモデータ投入。データがなければ顧客100件と架電履歴を入れる。"""
+    create_tables(engine)
+    db = SessionLocal()
+    try:
+        existing = db.query(Customer).count()
+    finally:
+        db.close()
+    if existing > 0:
+        print(f"既にデータが存在します（{existing}件）。シードをスキップします。")
+        return
+
+    generate(customers=100)
+    print("シード完了: 顧客100件 + 架電履歴を投入しました。")
+
+
+def _parse_calls(value: str):
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="ダミーの顧客・架電履歴を生成して投入する")
+    parser.add_argument("--customers", type=int, default=100, help="生成する顧客数")
+    parser.add_argument("--calls-per-customer", type=_parse_calls, default=(1, 5),
+                        help="顧客あたりの架電履歴数（例: 3 または 1-5）")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1回に投入する顧客数")
+    parser.add_argument("--no-ngram-index", action="store_true",
+                        help="あいまい一致用の company_ngram を作らない（投入を速くする）")
+    args = parser.parse_args(argv)
+
+    create_tables(engine)
+    from app.migrations.runner import run_migrations
+    run_migrations(engine)
+
+    min_calls, max_calls = args.calls_per_customer
+    result = generate(
+        customers=args.customers,
+        min_calls=min_calls,
+        max_calls=max_calls,
+        random_seed=args.seed,
+        batch_size=args.batch_size,
+        index_ngrams=not args.no_ngram_index,
+    )
+    print(
+        f"シード完了: 顧客{result['customers']}件 + 架電履歴{result['call_records']}件"
+        f" + bigram {result['company_ngrams']}件"
+        f"（{result['seconds']}秒, {result['rows_per_sec']}行/秒、スコア計算 {result['scoring_seconds']}秒）"
+    )
+
 
 if __name__ == "__main__":
-    seed()
+    main()
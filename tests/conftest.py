@@ -0,0 +1,95 @@
+"""テスト共通の設定とフィクスチャ。
+
+app.database はインポート時に DATABASE_URL からエンジンを作るため、アプリを読み込む前に
+一時ディレクトリの SQLite ファイルへ向ける（MySQL のドライバがなくても動くように）。
+アプリは TestClient でセッションごとに1回だけ起動し（テーブル作成・マイグレーション・シード）、
+各テストは会社名などにテストごとの接尾辞を付けて、他のテストのデータと混ざらないようにする。
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="call_recommend_test_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR / 'app.db'}"
+for _name in ("READ_DATABASE_URL", "ASYNC_DATABASE_URL", "ASYNC_READ_DATABASE_URL"):
+    os.environ.pop(_name, None)
+os.environ.update({
+    "STARTUP_MODE": "full",
+    "HINT_BACKEND": "stub",
+    # 事前生成はテストから直接呼ぶ
+    "HINT_PREFETCH_INTERVAL": "0",
+    # 小さいファイルでも複数チャンクに分かれるようにする
+    "IMPORT_CHUNK_SIZE": "50",
+    "IMPORT_WORKERS": "1",
+    "IMPORT_UPLOAD_DIR": str(_TMP_DIR / "uploads"),
+    "DB_POOL_WARMUP": "1",
+    "DB_WAIT_TIMEOUT": "5",
+})
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cookies(request):
+    # read-your-writes の Cookie を次のテストに持ち越さない
+    yield
+    if "client" in request.fixturenames:
+        request.getfixturevalue("client").cookies.clear()
+
+
+@pytest.fixture
+def suffix() -> str:
+    """テストごとに一意な接尾辞（会社名の重複判定に当たらないように付ける）。"""
+    return uuid.uuid4().hex[:8]
+
+
+@pytest.fixture
+def db():
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def add_customer(client, suffix):
+    """手動登録の API で顧客を作り、customer_id を返す。"""
+    def _add(company_name=None, total_purchase=0.0, **fields):
+        data = {
+            "customer_name": fields.pop("customer_name", "テスト 太郎"),
+            "company_name": company_name or f"テスト商事{suffix}",
+            "total_purchase": total_purchase,
+            **fields,
+        }
+        response = client.post("/api/import/manual", data=data)
+        assert response.status_code == 200, response.text
+        return response.json()["customer_id"]
+    return _add
+
+
+@pytest.fixture
+def add_call(client):
+    def _add(customer_id, call_date, call_result="不在", call_duration="01:00"):
+        response = client.post("/api/call-record", data={
+            "customer_id": customer_id,
+            "call_date": call_date.isoformat(),
+            "call_result": call_result,
+            "call_duration": call_duration,
+        })
+        assert response.status_code == 200, response.text
+    return _add
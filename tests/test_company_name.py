@@ -0,0 +1,70 @@
+"""normalize_company_name / company_ngrams の単体テスト（DB には接続しない）。"""
+
+import pytest
+
+from app.services.company_name import company_ngrams, normalize_company_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    # 法人格（前）
+    ("株式会社東京商事", "東京商事"),
+    ("有限会社山田工務店", "山田工務店"),
+    ("一般社団法人日本協会", "日本協会"),
+    ("医療法人社団 健康会", "健康会"),
+    ("ＮＰＯ法人 ひまわり", "ひまわり"),
+    ("㈱東京商事", "東京商事"),
+    # 法人格（後）
+    ("東京商事株式会社", "東京商事"),
+    ("東京商事(株)", "東京商事"),
+    ("東京商事（株）", "東京商事"),
+    ("東京商事　株式会社", "東京商事"),
+    ("(株)東京商事(有)", "東京商事"),
+    # 法人格だけの名前は残す
+    ("株式会社", "株式会社"),
+    ("(株)", "(株)"),
+])
+def test_normalize_legal_forms(name, expected):
+    assert normalize_company_name(name) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("ＴＯＫＹＯ　ＳＨＯＪＩ", "tokyoshoji"),
+    ("ﾄｳｷｮｳｼｮｳｼﾞ", "トウキョウショウジ"),
+    ("東京商事１２３", "東京商事123"),
+    ("特定非営利活動法人ＡＢＣ", "abc"),
+])
+def test_normalize_width_and_case(name, expected):
+    assert normalize_company_name(name) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Acme Inc.", "acme"),
+    ("Acme, Inc.", "acme"),
+    ("ACME Co., Ltd.", "acme"),
+    ("Acme Co.,Ltd", "acme"),
+    ("Acme Corporation", "acme"),
+    ("Acme Corp.", "acme"),
+    ("Acme Ltd.", "acme"),
+    ("Acme K.K.", "acme"),
+    ("Acme KK", "acme"),
+    ("Acme LLC", "acme"),
+    # 語の途中の "inc" は削らない
+    ("Zinc", "zinc"),
+    ("Zinc Inc.", "zinc"),
+])
+def test_normalize_english_suffixes(name, expected):
+    assert normalize_company_name(name) == expected
+
+
+@pytest.mark.parametrize("name", [None, "", "   "])
+def test_normalize_empty(name):
+    assert normalize_company_name(name) is None
+
+
+@pytest.mark.parametrize("key, expected", [
+    (None, set()),
+    ("東", {"東"}),
+    ("東京商事", {"東京", "京商", "商事"}),
+])
+def test_company_ngrams(key, expected):
+    assert company_ngrams(key) == expected
@@ -0,0 +1,73 @@
+"""顧客詳細（架電履歴のカーソル）と複数顧客の一括取得のテスト。"""
+from datetime import date, timedelta
+
+
+def _history_pages(client, customer_id, history_limit):
+    pages = []
+    params = {"history_limit": history_limit}
+    while True:
+        detail = client.get(f"/api/customer/{customer_id}", params=params).json()
+        pages.append(detail["call_history"])
+        cursor = detail["next_history_cursor"]
+        if cursor is None:
+            return pages
+        params = {"history_limit": history_limit, "history_cursor": cursor}
+
+
+def test_history_cursor_pages_through_all_calls(client, add_customer, add_call):
+    customer_id = add_customer()
+    today = date.today()
+    # 同じ日の架電が複数あってもページ境界で重複・欠落しない
+    for days_ago, result in [(1, "不在"), (1, "資料送付"), (1, "見積依頼"), (3, "不在"), (5, "不在"),
+                             (5, "折り返し"), (8, "不在")]:
+        add_call(customer_id, today - timedelta(days=days_ago), result)
+
+    full = client.get(f"/api/customer/{customer_id}", params={"history_limit": 50}).json()
+    assert full["next_history_cursor"] is None
+    dates = [item["call_date"] for item in full["call_history"]]
+    assert dates == sorted(dates, reverse=True) and len(dates) == 7
+
+    pages = _history_pages(client, customer_id, 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [item for page in pages for item in page] == full["call_history"]
+
+
+def test_history_cursor_is_validated(client, add_customer):
+    customer_id = add_customer()
+    response = client.get(f"/api/customer/{customer_id}", params={"history_cursor": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_unknown_customer(client):
+    detail = client.get("/api/customer/999999999").json()
+    assert detail["customer_name"] == "不明な顧客"
+    assert detail["call_history"] == []
+
+
+def test_batch_customers_keep_order_and_limit_history(client, add_customer, add_call, suffix):
+    first = add_customer(f"一括A{suffix}")
+    second = add_customer(f"一括B{suffix}")
+    today = date.today()
+    for days_ago in range(4):
+        add_call(first, today - timedelta(days=days_ago))
+    add_call(second, today)
+
+    response = client.get("/api/customers", params={"ids": f"{second},999999999,{first}", "history_limit": 2})
+    details = response.json()
+    assert [detail["customer_id"] for detail in details] == [second, 999999999, first]
+    assert [len(detail["call_history"]) for detail in details] == [1, 0, 2]
+    assert details[0]["next_history_cursor"] is None
+
+    # 一括取得のカーソルを顧客詳細に渡すと続きから読める
+    rest = client.get(f"/api/customer/{first}", params={
+        "history_limit": 10, "history_cursor": details[2]["next_history_cursor"],
+    }).json()
+    assert len(rest["call_history"]) == 2
+    assert rest["call_history"][0]["call_date"] == (today - timedelta(days=2)).isoformat()
+
+
+def test_batch_customers_validates_ids(client):
+    assert client.get("/api/customers", params={"ids": "1,x"}).status_code == 400
+    assert client.get("/api/customers", params={"ids": ","}).status_code == 400
+    too_many = ",".join(str(i) for i in range(1, 202))
+    assert client.get("/api/customers", params={"ids": too_many}).status_code == 400
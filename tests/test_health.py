@@ -0,0 +1,33 @@
+"""/healthz と /readyz のテスト。"""
+from app.routers import health
+
+
+def test_healthz(client):
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_after_startup(client):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_while_starting(client, monkeypatch):
+    monkeypatch.setattr(health, "_ready", False)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting"}
+    # 起動中でもプロセスは応答できる
+    assert client.get("/healthz").status_code == 200
+
+
+def test_readyz_when_database_is_down(client, monkeypatch):
+    async def fail(target):
+        raise ConnectionRefusedError("connection refused")
+
+    monkeypatch.setattr(health, "ping", fail)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "errors": {"primary": "connection refused"}}
@@ -0,0 +1,102 @@
+"""ヒントのキャッシュキー（顧客の状態）と、リースを取ったワーカーだけが行う事前生成のテスト。
+
+非同期の関数は TestClient のイベントループ（client.portal）で実行する。
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.models.generated_hint import GeneratedHint
+from app.services import hint_engine, hint_prefetch, task_lease
+
+
+class CountingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, state):
+        self.calls += 1
+        return f"{state['company_name']} 向けのヒント（架電{len(state['recent_calls'])}件）"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    counting = CountingBackend()
+    monkeypatch.setattr(hint_engine, "_backend", counting)
+    hint_engine.clear()
+    yield counting
+    hint_engine.clear()
+
+
+def _state_key(client, customer_id):
+    from app.database import AsyncSessionLocal
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return hint_engine.state_key(await hint_engine.load_state(db, customer_id))
+    return client.portal.call(load)
+
+
+def _hint(client, customer_id):
+    return client.get("/api/script-hint", params={"customer_id": customer_id}).json()["hint"]
+
+
+def test_hint_key_changes_when_a_call_is_recorded(client, db, backend, add_customer, add_call, suffix):
+    customer_id = add_customer(f"ヒント商事{suffix}")
+    key = _state_key(client, customer_id)
+    assert _hint(client, customer_id) == f"ヒント商事{suffix} 向けのヒント（架電0件）"
+    assert _hint(client, customer_id) == f"ヒント商事{suffix} 向けのヒント（架電0件）"
+    assert backend.calls == 1
+    assert db.scalar(select(GeneratedHint.customer_id).where(GeneratedHint.state_key == key)) == customer_id
+
+    # 架電を記録すると状態が変わり、明示的に消さなくても作り直される
+    add_call(customer_id, date.today(), "不在")
+    assert _state_key(client, customer_id) != key
+    assert _hint(client, customer_id) == f"ヒント商事{suffix} 向けのヒント（架電1件）"
+    assert backend.calls == 2
+
+
+def test_hint_is_shared_through_generated_hint(client, backend, add_customer):
+    customer_id = add_customer()
+    hint = _hint(client, customer_id)
+    # 別のワーカー（メモリのキャッシュが空）でも generated_hint から返す
+    hint_engine.clear()
+    assert _hint(client, customer_id) == hint
+    assert backend.calls == 1
+
+
+def test_unknown_customer_gets_default_hint(client, backend):
+    assert _hint(client, 999999999) == hint_engine.DEFAULT_HINT
+    assert backend.calls == 0
+
+
+def test_prefetch_lease_is_held_by_one_worker(client, db, monkeypatch):
+    with monkeypatch.context() as other:
+        other.setattr(task_lease, "owner", lambda: "other-worker")
+        assert task_lease.acquire(db, hint_prefetch.LEASE_NAME, 60)
+    # 他のワーカーが期限内で持っている間は取れない
+    assert client.portal.call(hint_prefetch._acquire_lease) is False
+
+    with monkeypatch.context() as other:
+        other.setattr(task_lease, "owner", lambda: "other-worker")
+        task_lease.release(db, hint_prefetch.LEASE_NAME)
+    assert client.portal.call(hint_prefetch._acquire_lease) is True
+    # 持っているワーカーは延長できる
+    assert client.portal.call(hint_prefetch._acquire_lease) is True
+    client.portal.call(hint_prefetch._release_lease)
+
+
+def test_prefetch_generates_each_hint_once(client, db, backend, monkeypatch):
+    monkeypatch.setattr(hint_prefetch, "HINT_PREFETCH_RATE", 0)
+    db.execute(delete(GeneratedHint))
+    db.commit()
+
+    first = client.portal.call(hint_prefetch.prefetch_once, 5)
+    assert first == {"customers": 5, "generated": 5, "from_store": 0}
+    assert client.portal.call(hint_prefetch.prefetch_once, 5) == {"customers": 5, "generated": 0, "from_store": 0}
+
+    # メモリのキャッシュがないワーカーは generated_hint の分を使う
+    hint_engine.clear()
+    assert client.portal.call(hint_prefetch.prefetch_once, 5) == {"customers": 5, "generated": 0, "from_store": 5}
+    assert backend.calls == 5
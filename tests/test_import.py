@@ -0,0 +1,174 @@
+"""顧客・架電・名刺の取込と取込ジョブのテスト（IMPORT_CHUNK_SIZE=50 で複数チャンクに分ける）。"""
+import io
+import json
+import time
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+
+from app.models.customer import Customer
+from app.services.customer_import import detect_encoding
+
+JOB_TIMEOUT = 60
+
+
+def _csv(rows, header="customer_name,company_name,total_purchase"):
+    return header + "\n" + "".join(",".join(map(str, row)) + "\n" for row in rows)
+
+
+def _post_csv(client, body: bytes, path="/api/import/csv", filename="customers.csv"):
+    return client.post(path, files={"file": (filename, body, "text/csv")})
+
+
+def _company_names(db, prefix):
+    return sorted(name for (name,) in db.query(Customer.company_name).filter(
+        Customer.company_name.startswith(prefix)
+    ))
+
+
+def test_csv_import_counts_across_chunks(client, add_customer, suffix):
+    existing = f"登録済{suffix}"
+    add_customer(existing)
+    rows = [(f"担当{i}", f"CSV商事{suffix}-{i}", i * 1000) for i in range(80)]
+    # 後のチャンクに出てくるファイル内の重複（法人格の違いも同じ会社とみなす）
+    rows += [(f"担当{i}", f"CSV商事{suffix}-{i}", 0) for i in range(40)]
+    rows += [("担当X", f"株式会社CSV商事{suffix}-0", 0)]
+    rows += [("担当Y", existing, 0), ("担当Z", "", 0), ("", f"名前なし{suffix}", 0)]
+    body = _csv(rows).encode()
+
+    result = _post_csv(client, body).json()
+    assert result == {"success": True, "imported": 80, "skipped": 1, "duplicates": 41, "failed": 2}
+
+    again = _post_csv(client, body).json()
+    assert again == {"success": True, "imported": 0, "skipped": 81, "duplicates": 41, "failed": 2}
+
+
+def test_csv_import_shift_jis(client, db, suffix):
+    rows = [(f"山田 花子{i}", f"東京物産{suffix}-{i}", 100) for i in range(3)]
+    response = _post_csv(client, _csv(rows).encode("cp932"))
+    assert response.json()["imported"] == 3
+    assert _company_names(db, f"東京物産{suffix}") == [f"東京物産{suffix}-{i}" for i in range(3)]
+
+
+def test_encoding_is_detected_from_the_whole_file(client, db, suffix):
+    # 先頭のチャンクは ASCII だけで、Shift_JIS の文字は後のチャンクにある
+    rows = [(f"name{i}", f"ascii{suffix}-{i}", 0) for i in range(60)]
+    rows += [("佐藤 一郎", f"大阪工業{suffix}", 0)]
+    body = _csv(rows).encode("cp932")
+    assert detect_encoding(io.BytesIO(body), block_size=16) == "cp932"
+
+    response = _post_csv(client, body)
+    assert response.json()["imported"] == 61
+    assert _company_names(db, f"大阪工業{suffix}") == [f"大阪工業{suffix}"]
+
+
+def test_csv_import_rejects_unreadable_files(client, db, suffix):
+    # UTF-8 としても Shift_JIS としても読めないバイト列を後のチャンクに置く
+    rows = [(f"name{i}", f"不正{suffix}-{i}", 0) for i in range(60)]
+    body = _csv(rows).encode() + b"x,\x81 ,0\n"
+    response = _post_csv(client, body)
+    assert response.status_code == 400
+    assert "文字コード" in response.json()["detail"]
+    # 途中のチャンクまでコミットされていない
+    assert _company_names(db, f"不正{suffix}") == []
+
+    assert _post_csv(client, b"").json() == {"detail": "CSVが空です"}
+    assert _post_csv(client, b"a,b\n1,2\n").status_code == 400
+    assert _post_csv(client, b"x", filename="customers.txt").status_code == 400
+
+
+def test_excel_import_reads_all_sheets(client, db, suffix):
+    workbook = Workbook()
+    summary = workbook.active
+    summary.title = "集計"
+    summary.append(["合計", 60])
+    sheet = workbook.create_sheet("顧客")
+    sheet.append(["customer_name", "company_name", "total_purchase", "last_purchase_date"])
+    for i in range(60):
+        sheet.append([f"担当{i}", f"Excel商事{suffix}-{i:02d}", 1000, date(2024, 1, 1)])
+    sheet.append([None, None, None, None])
+    sheet.append(["担当", f"Excel商事{suffix}-00", 0, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    response = client.post("/api/import/excel", files={"file": ("customers.xlsx", buffer.getvalue())})
+    assert response.json() == {"success": True, "imported": 60, "skipped": 0, "duplicates": 1, "failed": 0}
+    customer = db.query(Customer).filter(Customer.company_name == f"Excel商事{suffix}-00").one()
+    assert customer.last_purchase_date == date(2024, 1, 1)
+    assert customer.last_contact_method == "Excel取込"
+
+    broken = client.post("/api/import/excel", files={"file": ("customers.xlsx", b"not a zip")})
+    assert broken.status_code == 400
+
+
+def test_call_records_import(client, add_customer):
+    customer_id = add_customer()
+    called = date.today() - timedelta(days=4)
+    body = _csv([
+        (customer_id, called.isoformat(), "不在", "00:30"),
+        (customer_id, (called - timedelta(days=10)).isoformat(), "資料送付", "03:00"),
+        ("abc", called.isoformat(), "不在", ""),
+        (999999999, called.isoformat(), "不在", ""),
+    ], header="customer_id,call_date,call_result,call_duration").encode()
+
+    response = _post_csv(client, body, path="/api/import/call-records")
+    assert response.json() == {"success": True, "imported": 2, "invalid": 1, "unknown_customer": 1}
+    items = client.get("/api/priority-list").json()
+    item = next(item for item in items if item["customer_id"] == customer_id)
+    assert item["days_since_last_call"] == 4
+
+
+def test_cards_batch_import(client, add_customer, suffix):
+    existing_id = add_customer(f"名刺商事{suffix}")
+    cards = [
+        {"company_name": f"株式会社名刺商事{suffix}", "personal_name": "A"},
+        {"company_name": f"新規名刺{suffix}", "personal_name": "B", "email": "b@example.com"},
+        {"company_name": f"新規名刺{suffix}", "personal_name": "C"},
+    ]
+    lines = [json.dumps(card, ensure_ascii=False) for card in cards] + ["{broken", '{"company_name": "x"}', ""]
+    response = client.post("/api/import/cards", content="\n".join(lines).encode())
+    result = response.json()
+    assert result["imported"] == 3
+    assert result["new_customers"] == 1
+    assert result["matched_customers"] == 1
+    assert result["failed"] == 2
+    assert [error["line"] for error in result["errors"]] == [4, 5]
+
+    card = client.post("/api/import/card", data={"company_name": f"名刺商事{suffix}", "personal_name": "D"})
+    assert card.json() == {"success": True, "customer_id": existing_id, "match": "exact"}
+
+
+def test_manual_import_rejects_same_company(client, add_customer, suffix):
+    add_customer(f"手動商事{suffix}")
+    response = client.post("/api/import/manual", data={
+        "customer_name": "x", "company_name": f"手動商事{suffix}　株式会社",
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "同じ会社名の顧客が既に登録されています"
+
+
+def test_import_job_reports_progress_counts(client, add_customer, suffix):
+    existing = f"ジョブ既存{suffix}"
+    add_customer(existing)
+    rows = [(f"担当{i}", f"ジョブ商事{suffix}-{i % 70}", i) for i in range(120)]
+    rows += [("担当", existing, 0), ("担当", "", 0)]
+    response = client.post("/api/import/jobs", files={"file": ("job.csv", _csv(rows).encode(), "text/csv")})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.2)
+        job = client.get(f"/api/import/jobs/{job['job_id']}").json()
+    assert job["status"] == "succeeded", job
+    assert (job["processed"], job["imported"], job["skipped"], job["duplicates"], job["failed"]) == (
+        122, 70, 1, 50, 1,
+    )
+    assert job["processed"] == job["imported"] + job["skipped"] + job["duplicates"] + job["failed"]
+
+
+def test_import_job_errors(client):
+    assert client.get("/api/import/jobs/unknown").status_code == 404
+    response = client.post("/api/import/jobs", files={"file": ("job.txt", b"x", "text/plain")})
+    assert response.status_code == 400
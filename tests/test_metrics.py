@@ -0,0 +1,94 @@
+"""リクエスト単位の DB 計測ヘッダーと /metrics（Prometheus のテキスト形式）のテスト。"""
+import re
+
+from app.services import db_metrics
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[^"}]|"(?:[^"\\]|\\.)*")*\})? (\S+)$')
+
+
+def _families(text):
+    """(メトリクス名, HELP/TYPE/サンプル行) の並びにする。"""
+    lines = []
+    for line in text.splitlines():
+        if line.startswith("# "):
+            _, kind, name, _ = (line.split(" ", 3) + [""])[:4]
+            assert kind in ("HELP", "TYPE"), line
+            lines.append((name, line))
+        else:
+            match = SAMPLE.match(line)
+            assert match, line
+            lines.append((re.sub(r"_(bucket|sum|count)$", "", match.group(1)), line))
+    return lines
+
+
+def test_db_metrics_headers(client, add_customer):
+    customer_id = add_customer()
+    response = client.get(f"/api/customer/{customer_id}")
+    assert int(response.headers["X-DB-Statements"]) >= 2
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    assert float(response.headers["X-DB-Pool-Wait-Ms"]) >= 0
+    assert re.fullmatch(r"db;dur=[\d.]+, db-pool;dur=[\d.]+", response.headers["Server-Timing"])
+    assert "X-DB-Repeated-Statements" not in response.headers
+
+    # DB を使わないエンドポイントは 0 件
+    assert client.get("/healthz").headers["X-DB-Statements"] == "0"
+
+
+def test_repeated_statements_are_reported(client, add_customer, suffix, monkeypatch, capsys):
+    monkeypatch.setattr(db_metrics, "N_PLUS_ONE_THRESHOLD", 2)
+    ids = [add_customer(f"計測{suffix}-{i}") for i in range(4)]
+    # 一括取得は顧客数によらず同じ SQL を繰り返さない
+    response = client.get("/api/customers", params={"ids": ",".join(map(str, ids))})
+    assert "X-DB-Repeated-Statements" not in response.headers
+
+    # 名刺の一括取込はチャンク（50件）ごとに同じ検索を発行する
+    cards = "\n".join(
+        '{"company_name": "計測名刺%s-%d", "personal_name": "A"}' % (suffix, i) for i in range(150)
+    )
+    response = client.post("/api/import/cards", content=cards.encode())
+    assert int(response.headers["X-DB-Repeated-Statements"]) >= 3
+    assert "[N+1 の疑い] POST /api/import/cards" in capsys.readouterr().out
+
+
+def test_statement_shape_ignores_in_list_size():
+    assert db_metrics.statement_shape("SELECT x FROM t WHERE id IN (?, ?,\n ?)") == \
+        db_metrics.statement_shape("SELECT x  FROM t WHERE id IN (?)")
+
+
+def test_metrics_exposition_format(client, add_customer):
+    customer_id = add_customer()
+    client.get(f"/api/customer/{customer_id}")
+    client.get("/no-such-page")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert response.text.endswith("\n")
+
+    lines = _families(response.text)
+    # 1つのメトリクスの HELP・TYPE・サンプルはひと続きに出る
+    seen, previous = set(), None
+    for name, _ in lines:
+        if name != previous:
+            assert name not in seen, f"{name} が分かれて出ています"
+            seen.add(name)
+            previous = name
+    assert {"http_request_duration_seconds", "http_requests_total", "db_pool_size",
+            "db_pool_checked_out", "db_pool_overflow"} <= seen
+
+    samples = [line for _, line in lines if not line.startswith("#")]
+    route = 'route="/api/customer/{customer_id}"'
+    buckets = [
+        (re.search(r'le="([^"]+)"', line).group(1), float(line.rsplit(" ", 1)[1]))
+        for line in samples
+        if line.startswith("http_request_duration_seconds_bucket") and route in line
+    ]
+    counts = [count for _, count in buckets]
+    # バケットは累積で、最後の +Inf が件数と一致する
+    assert counts == sorted(counts) and buckets[-1][0] == "+Inf"
+    count_line = next(line for line in samples
+                      if line.startswith("http_request_duration_seconds_count") and route in line)
+    assert float(count_line.rsplit(" ", 1)[1]) == counts[-1]
+
+    assert any('route="unmatched"' in line and 'status="404"' in line for line in samples)
+    assert any(line.startswith('db_pool_size{engine="sync"}') for line in samples)
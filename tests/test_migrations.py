@@ -0,0 +1,103 @@
+"""マイグレーションの適用（python -m app.migrations upgrade）とインデックスの確認（check）のテスト。"""
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.migrations import __main__ as cli
+from app.migrations.explain import check_index_usage
+from app.migrations.runner import MIGRATIONS, applied_versions, run_migrations
+from app.models import create_tables
+from app.services.company_name import company_ngrams, normalize_company_name
+
+# 変更前（company_key などの追加前）の customer テーブル
+OLD_CUSTOMER_DDL = """
+CREATE TABLE customer (
+    customer_id INTEGER PRIMARY KEY,
+    customer_name VARCHAR(255) NOT NULL,
+    contact_number VARCHAR(20),
+    email VARCHAR(255),
+    address VARCHAR(255),
+    company_name VARCHAR(255) NOT NULL,
+    last_purchase_date DATE,
+    total_purchase FLOAT,
+    last_contact_method VARCHAR(50)
+)
+"""
+OLD_CALL_RECORD_DDL = """
+CREATE TABLE call_record (
+    call_id INTEGER PRIMARY KEY,
+    customer_id INTEGER NOT NULL,
+    call_date DATE NOT NULL,
+    call_result VARCHAR(255),
+    call_duration VARCHAR(20)
+)
+"""
+
+
+def _engine(tmp_path, name="migrate.db"):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_upgrade_fresh_database_is_idempotent(tmp_path):
+    engine = _engine(tmp_path)
+    create_tables(engine)
+    assert run_migrations(engine) == [version for version, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+    assert applied_versions(engine) == {version for version, _ in MIGRATIONS}
+    engine.dispose()
+
+
+def test_upgrade_existing_database(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text(OLD_CUSTOMER_DDL))
+        conn.execute(text(OLD_CALL_RECORD_DDL))
+        conn.execute(text(
+            "INSERT INTO customer (customer_id, customer_name, company_name, total_purchase) VALUES"
+            " (1, 'A', '株式会社東京商事', 0), (2, 'B', '東京商事(株)', 0), (3, 'C', 'ＡＢＣ　Inc.', 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO call_record (customer_id, call_date, call_result) VALUES"
+            " (1, '2024-01-01', '不在'), (1, '2024-03-01', '不在'), (3, '2024-02-01', '資料送付')"
+        ))
+    create_tables(engine)
+    run_migrations(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("customer")}
+    assert {"company_key", "latest_call_date"} <= columns
+    with engine.connect() as conn:
+        customers = conn.execute(text(
+            "SELECT customer_id, company_key, latest_call_date FROM customer ORDER BY customer_id"
+        )).all()
+        grams = set(conn.execute(text("SELECT gram, customer_id FROM company_ngram")).all())
+    # 正規化後に重複する顧客は古い方だけにキーを付ける
+    assert [(c[0], c[1]) for c in customers] == [(1, "東京商事"), (2, None), (3, "abc")]
+    assert [str(c[2]) if c[2] else None for c in customers] == ["2024-03-01", None, "2024-02-01"]
+    # 0004 のマイグレーション内の bigram は、現在の company_ngrams と同じになる
+    assert grams == {
+        (gram, customer_id)
+        for customer_id, name in ((1, "株式会社東京商事"), (3, "ＡＢＣ　Inc."))
+        for gram in company_ngrams(normalize_company_name(name))
+    }
+    engine.dispose()
+
+
+def test_check_uses_hot_path_indexes(client, db, capsys):
+    checks = check_index_usage(db)
+    assert checks and all(check.ok for check in checks), checks
+
+    assert cli.main(["app.migrations", "check"]) == 0
+    out = capsys.readouterr().out
+    assert out.count("[OK]") == len(checks)
+    assert "[NG]" not in out
+
+
+def test_check_reports_missing_index(tmp_path):
+    engine = _engine(tmp_path)
+    create_tables(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_customer_priority_score"))
+    with Session(engine) as db:
+        failed = [check.name for check in check_index_usage(db) if not check.ok]
+    assert failed == ["scoring.get_priority_list"]
+    engine.dispose()
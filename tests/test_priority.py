@@ -0,0 +1,107 @@
+"""customer_priority の維持（書き込み時の refresh と日次の rebuild）のテスト。"""
+from datetime import date, timedelta
+
+from sqlalchemy import func, select, text
+
+from app.models.call_record import CallRecord
+from app.models.customer import Customer
+from app.models.customer_priority import CustomerPriority
+from app.services import priority_service, task_lease
+from app.services.scoring_engine import score_batch, score_expression
+
+
+def _old_score(total_purchase, latest_call_date, today):
+    """変更前の /api/priority-list がリクエストごとに計算していた値（丸め前）。"""
+    if latest_call_date:
+        days = max((today - latest_call_date).days, 1)
+    else:
+        days = 365
+    return days, (total_purchase / 1000) + (1 / days) * 100
+
+
+def _priority_rows(db, customer_ids):
+    rows = db.execute(
+        select(CustomerPriority).where(CustomerPriority.customer_id.in_(customer_ids))
+    ).scalars()
+    return {
+        row.customer_id: (row.latest_call_date, row.days_since_last_call, row.score, row.scored_on)
+        for row in rows
+    }
+
+
+def test_refresh_matches_old_per_request_score(client, db, add_customer, add_call, suffix):
+    today = date.today()
+    ids = [
+        add_customer(f"スコア商事{suffix}-{i}", total_purchase=purchase)
+        for i, purchase in enumerate([0, 1234567, 5005, 999999.5])
+    ]
+    add_call(ids[1], today - timedelta(days=10))
+    add_call(ids[1], today - timedelta(days=3))
+    add_call(ids[2], today)
+    add_call(ids[3], today - timedelta(days=400))
+
+    items = {item["customer_id"]: item for item in client.get("/api/priority-list").json()}
+    for customer_id in ids:
+        customer = db.get(Customer, customer_id)
+        latest = db.scalar(
+            select(func.max(CallRecord.call_date)).where(CallRecord.customer_id == customer_id)
+        )
+        days, score = _old_score(customer.total_purchase, latest, today)
+        assert items[customer_id]["days_since_last_call"] == days
+        assert abs(items[customer_id]["score"] - score) <= 0.005 + 1e-9
+
+
+def test_rebuild_matches_refresh(client, db, add_customer, add_call, suffix):
+    today = date.today()
+    ids = [
+        add_customer(f"再計算商事{suffix}-{i}", total_purchase=purchase)
+        for i, purchase in enumerate([0, 1005, 2675, 123456789])
+    ]
+    for days_ago, customer_id in zip([0, 1, 7, 200], ids):
+        add_call(customer_id, today - timedelta(days=days_ago))
+    refreshed = _priority_rows(db, ids)
+    db.rollback()
+
+    priority_service.rebuild_priority(db, today)
+    assert _priority_rows(db, ids) == refreshed
+
+
+def test_batch_and_sql_round_half_up(db):
+    # x.xx5 ちょうどの値も含めて、NumPy と SQL で同じ値に丸める
+    purchases = [5.0, 15.0, 25.0, 1005.0, 2675.0, 0.0]
+    days = [1, 1, 1, 8, 3, 365]
+    today = date.today()
+    latest = [today - timedelta(days=d) for d in days]
+    _, batch = score_batch(purchases, latest, today)
+    for purchase, day, expected in zip(purchases, days, batch.tolist()):
+        sql = db.scalar(select(score_expression(text(repr(purchase)), text(str(day)))))
+        assert sql == expected
+    # 100.005 は切り上げる（round() の偶数丸めなら 100.0）
+    assert batch.tolist()[0] == 100.01
+
+
+def test_rollover_runs_only_on_lease_holder(client, db, add_customer, monkeypatch):
+    customer_id = add_customer()
+    yesterday = date.today() - timedelta(days=1)
+    db.query(CustomerPriority).filter(CustomerPriority.customer_id == customer_id).update(
+        {"scored_on": yesterday}
+    )
+    db.commit()
+    monkeypatch.setattr(task_lease, "owner", lambda: "other-worker")
+    assert task_lease.acquire(db, priority_service.ROLLOVER_LEASE_NAME, 60)
+    monkeypatch.undo()
+
+    # 他のワーカーがリースを持っている間は作り直さず、確認済みにするだけ
+    monkeypatch.setattr(priority_service, "_checked_on", None)
+    priority_service.ensure_priority_current(db)
+    assert priority_service.priority_checked_today()
+    assert db.get(CustomerPriority, customer_id).scored_on == yesterday
+
+    monkeypatch.setattr(task_lease, "owner", lambda: "other-worker")
+    task_lease.release(db, priority_service.ROLLOVER_LEASE_NAME)
+    monkeypatch.undo()
+
+    monkeypatch.setattr(priority_service, "_checked_on", None)
+    priority_service.ensure_priority_current(db)
+    db.expire_all()
+    assert db.get(CustomerPriority, customer_id).scored_on == date.today()
@@ -0,0 +1,56 @@
+"""/api/priority-list のキーセットページング・キャッシュ・ETag のテスト。"""
+from app.services import priority_cache
+
+
+def test_keyset_pages_match_full_list(client):
+    full = client.get("/api/priority-list").json()
+    assert [item["score"] for item in full] == sorted((item["score"] for item in full), reverse=True)
+
+    pages = []
+    params = {"limit": 7}
+    while True:
+        page = client.get("/api/priority-list", params=params).json()
+        if not page:
+            break
+        pages += page
+        params = {"limit": 7, "after_score": page[-1]["score"], "after_id": page[-1]["customer_id"]}
+    assert pages == full
+
+
+def test_after_score_requires_after_id(client):
+    response = client.get("/api/priority-list", params={"after_score": 1.0})
+    assert response.status_code == 400
+
+
+def test_search_by_customer_name(client, add_customer, suffix):
+    customer_id = add_customer(customer_name=f"検索 {suffix}")
+    found = client.get("/api/priority-list", params={"q": suffix}).json()
+    assert [item["customer_id"] for item in found] == [customer_id]
+
+
+def test_etag_and_not_modified(client):
+    priority_cache.invalidate()
+    first = client.get("/api/priority-list", params={"limit": 5})
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    # キャッシュから返すので DB には触れない
+    cached = client.get("/api/priority-list", params={"limit": 5})
+    assert cached.headers["ETag"] == etag
+    assert cached.headers["X-DB-Statements"] == "0"
+    assert cached.json() == first.json()
+
+    not_modified = client.get("/api/priority-list", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_write_invalidates_cache(client, add_customer):
+    first = client.get("/api/priority-list", params={"limit": 5})
+    etag = first.headers["ETag"]
+
+    customer_id = add_customer(total_purchase=10_000_000_000)
+    response = client.get("/api/priority-list", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["customer_id"] == customer_id
@@ -0,0 +1,76 @@
+"""レプリカへの読み込みの振り分けと read-your-writes の Cookie のテスト。
+
+レプリカは空の SQLite ファイルで代用する（プライマリの書き込みが届いていない状態）。
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.database as database
+import app.routers.scoring as scoring
+from app.models import create_tables
+from app.services import priority_cache
+
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    path = tmp_path / "replica.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    create_tables(sync_engine)
+    sync_engine.dispose()
+
+    url = f"sqlite:///{path}"
+    read_engine = create_async_engine(database.async_database_url(url), poolclass=NullPool)
+    monkeypatch.setattr(database, "READ_DATABASE_URL", url)
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", async_sessionmaker(read_engine, expire_on_commit=False))
+    monkeypatch.setattr(scoring, "READ_DATABASE_URL", url)
+    client.cookies.clear()
+    yield
+    client.cookies.clear()
+
+
+def test_reads_go_to_replica_until_the_client_writes(client, replica, suffix):
+    response = client.post("/api/import/manual", data={"customer_name": "x", "company_name": f"複製{suffix}"})
+    customer_id = response.json()["customer_id"]
+    cookie = response.cookies.get(database.READ_YOUR_WRITES_COOKIE)
+    assert cookie is not None
+
+    # 書き込んだクライアントはプライマリから読む
+    assert client.get(f"/api/customer/{customer_id}").json()["company_name"] == f"複製{suffix}"
+
+    # Cookie のない（他の）クライアントはレプリカから読む
+    client.cookies.clear()
+    assert client.get(f"/api/customer/{customer_id}").json()["customer_name"] == "不明な顧客"
+
+    # 期限切れ・壊れた Cookie はレプリカ
+    for value in ("0", "soon"):
+        client.cookies.set(database.READ_YOUR_WRITES_COOKIE, value)
+        assert client.get(f"/api/customer/{customer_id}").json()["customer_name"] == "不明な顧客"
+
+
+def test_failed_write_does_not_set_cookie(client, replica):
+    response = client.post("/api/call-record", data={
+        "customer_id": 999999999, "call_date": "2024-01-01", "call_result": "不在",
+    })
+    assert response.status_code == 404
+    assert database.READ_YOUR_WRITES_COOKIE not in response.cookies
+
+
+def test_replica_reads_do_not_poison_priority_cache(client, replica, suffix):
+    response = client.post("/api/import/manual", data={
+        "customer_name": "x", "company_name": f"複製一覧{suffix}", "total_purchase": 10_000_000_000,
+    })
+    customer_id = response.json()["customer_id"]
+    cookie = response.cookies.get(database.READ_YOUR_WRITES_COOKIE)
+
+    # 書き込み直後のレプリカの結果（書き込み前の内容）はキャッシュに載せない
+    client.cookies.clear()
+    assert client.get("/api/priority-list", params={"limit": 3}).json() == []
+    assert priority_cache.get((3, None, None, None)) is None
+
+    # 書き込んだクライアントはキャッシュを使わずプライマリから読む
+    client.cookies.set(database.READ_YOUR_WRITES_COOKIE, cookie)
+    own = client.get("/api/priority-list", params={"limit": 3})
+    assert own.json()[0]["customer_id"] == customer_id
+    assert int(own.headers["X-DB-Statements"]) > 0